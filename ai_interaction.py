@@ -2,57 +2,33 @@ import logging
 import time
 import uuid
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from oci.generative_ai_inference import GenerativeAiInferenceClient
-from oci.generative_ai_inference.models import ChatDetails, CohereChatRequest, OnDemandServingMode
 from constants import VALID_CATEGORIES, VERTICAL_SUMMARIES
 from utils import setup_oci_client, error_handler
-from text_processing import extract_key_content
+from text_processing import build_key_content, get_stop_words
 import re
 import functools
 from collections import Counter
-from nltk.tokenize import word_tokenize
-from nltk.corpus import stopwords
-import nltk
+from vertical_similarity import candidate_verticals
+from llm_cache import request_fingerprint, lookup_response, store_response, is_cache_only
+from response_parser import ResponseFieldParser, parse_response
+from nltk_resources import ensure_resource, load_nltk, sentence_tokenizer
 from config import OCI_COMPARTMENT_ID, OCI_MODEL_ID, MAX_TOKENS, TEMPERATURE, FREQUENCY_PENALTY, TOP_P, TOP_K
+from config import PROMPT_STATIC_PREAMBLE, PROMPT_TOP_K_VERTICALS, STREAM_REQUIRED_FIELDS
 import json
 
 logger = logging.getLogger(__name__)
 
-# Download NLTK data (if not already downloaded)
-nltk.download('punkt', quiet=True)
-nltk.download('stopwords', quiet=True)
 
-
-def construct_prompt(key_content, customer, relevant_data):
-    # Convert categories to string
+def render_static_prompt(vertical_summaries=VERTICAL_SUMMARIES):
+    # Everything in the prompt that does not depend on the company: the
+    # categories, vertical summaries and instructions
     categories = ', '.join(VALID_CATEGORIES)
-    
-    # Prepare company info
-    company_info = f"""
-1. Customer: {relevant_data['Customer']}
-2. City: {relevant_data['Maximum of City']}
-3. Country: {relevant_data['Maximum of Country']}
-4. State/Province: {relevant_data['Maximum of State/Province']}
-5. Web Address: {relevant_data['Web Address']}
-6. Homepage summary: {key_content['home']['summary']}
-7. Homepage top keywords: {', '.join(key_content['home']['top_keywords'])}
-8. About page summary: {key_content['about']['summary']}
-9. About page top keywords: {', '.join(key_content['about']['top_keywords'])}
-10. Combined top keywords: {', '.join(key_content['combined_keywords'])}
-11. Product page exists: {'Yes' if key_content['product_exists'] else 'No'}"""
-
-    # Construct the full prompt
-    full_prompt = f"""
-Customer: {customer}
-
-## Company Information
-{company_info}
-
+    return f"""
 ## Acceptable Business Industries
 {categories}
 
 ## Vertical Summaries
-{format_vertical_summaries(VERTICAL_SUMMARIES)}
+{format_vertical_summaries(vertical_summaries)}
 
 ## Keyword Usage and Confidence Assessment:
 
@@ -179,7 +155,52 @@ Before submitting your response, verify that you have:
 If the company information is too vague or doesn't clearly align with any category, select 'General Business' as the primary category and explain why in your reasoning. If you feel you need more information to make a confident categorization, state this clearly in your response.
 """
 
-    return full_prompt
+def format_company_info(key_content, customer, relevant_data, content_source='website'):
+    return f"""
+## Company to Categorize
+
+Content source: {content_source}
+Customer: {customer}
+
+## Company Information
+
+1. Customer: {relevant_data['Customer']}
+2. City: {relevant_data['Maximum of City']}
+3. Country: {relevant_data['Maximum of Country']}
+4. State/Province: {relevant_data['Maximum of State/Province']}
+5. Web Address: {relevant_data['Web Address']}
+6. Homepage summary: {key_content['home']['summary']}
+7. Homepage top keywords: {', '.join(key_content['home']['top_keywords'])}
+8. About page summary: {key_content['about']['summary']}
+9. About page top keywords: {', '.join(key_content['about']['top_keywords'])}
+10. Combined top keywords: {', '.join(key_content['combined_keywords'])}
+11. Product page exists: {'Yes' if key_content['product_exists'] else 'No'}
+"""
+
+@functools.lru_cache(maxsize=256)
+def static_prompt_for(verticals):
+    # The static prompt with only the summaries of the given verticals (a
+    # tuple of VERTICAL_SUMMARIES keys). Rows keep landing on the same few
+    # candidate sets, so each one is rendered once.
+    return render_static_prompt({vertical: VERTICAL_SUMMARIES[vertical] for vertical in verticals})
+
+def get_static_prompt(verticals=None):
+    return STATIC_PROMPT if verticals is None else static_prompt_for(tuple(verticals))
+
+def construct_prompt_parts(key_content, customer, relevant_data, content_source='website', verticals=None):
+    # (preamble, message) for the chat request. The static part comes first
+    # and the company last, so every request starts with the same ~30 KB
+    # prefix; with PROMPT_STATIC_PREAMBLE it is sent as the preamble instead
+    # and the message is only the company block. verticals limits the
+    # summaries to the candidates picked for this row.
+    static_prompt = get_static_prompt(verticals)
+    company_info = format_company_info(key_content, customer, relevant_data, content_source)
+    if PROMPT_STATIC_PREAMBLE:
+        return static_prompt, company_info
+    return None, static_prompt + company_info
+
+def construct_prompt(key_content, customer, relevant_data, content_source='website', verticals=None):
+    return get_static_prompt(verticals) + format_company_info(key_content, customer, relevant_data, content_source)
 
 
 def format_vertical_summaries(vertical_summaries):
@@ -194,21 +215,28 @@ def format_vertical_summaries(vertical_summaries):
     formatted_text += "\n"
   return formatted_text 
 
+# Rendered once at import; only the company block changes between rows
+STATIC_PROMPT = render_static_prompt()
+
 # Llama 3.1 405B - ocid1.generativeaimodel.oc1.us-chicago-1.amaaaaaask7dceyarleil5jr7k2rykljkhapnvhrqvzx4cwuvtfedlfxet4q
 # Command R+ - ocid1.generativeaimodel.oc1.us-chicago-1.amaaaaaask7dceya7ozidbukxwtun4ocm4ngco2jukoaht5mygpgr6gq2lgq
 # Command R - ocid1.generativeaimodel.oc1.us-chicago-1.amaaaaaask7dceyawk6mgunzodenakhkuwxanvt6wo3jcpf72ln52dymk4wq
 
-def prepare_chat_request(prompt, chat_history, is_url_processing):
+def prepare_chat_request(prompt, chat_history, is_url_processing, preamble=None, stream=True):
+    # Imported here so the OCI SDK only loads once a request is made
+    from oci.generative_ai_inference.models import ChatDetails, CohereChatRequest, OnDemandServingMode
     chat_detail = ChatDetails()
     chat_request = CohereChatRequest()
     chat_request.message = prompt
     chat_request.chat_history = chat_history
+    if preamble is not None:
+        chat_request.preamble_override = preamble
     chat_request.max_tokens = MAX_TOKENS
     chat_request.temperature = TEMPERATURE
     chat_request.frequency_penalty = FREQUENCY_PENALTY
     chat_request.top_p = TOP_P
     chat_request.top_k = TOP_K
-    chat_request.is_stream = True  
+    chat_request.is_stream = stream
     chat_detail.serving_mode = OnDemandServingMode(
         model_id=OCI_MODEL_ID
     )
@@ -231,6 +259,10 @@ def send_chat_request(generative_ai_inference_client, chat_detail, prompt):
         logger.error(f"Error in OCI GenAI Service request: {str(e)}")
         return None
 
+def response_text(chat_response):
+    # The whole answer of a non-streaming request, parsed once by the SDK
+    return chat_response.data.chat_response.text or ''
+
 def process_streaming_response(chat_response):
     for event in chat_response.data.events():
         res = json.loads(event.data)
@@ -240,55 +272,19 @@ def process_streaming_response(chat_response):
         if 'text' in res:
             yield res['text']
 
-def extract_category(response, category_type):
-    match = re.search(rf"{category_type.upper()}_CATEGORY:\s*(.*?)(?=\n|$)", response, re.IGNORECASE)
-    return match.group(1).strip() if match else 'N/A'
-
-def extract_confidence(response):
-    match = re.search(r'CONFIDENCE:\s*(.*?)(?=\n|$)', response, re.IGNORECASE)
-    return match.group(1).strip() if match else 'N/A'
-
-def extract_explanation(response):
-    match = re.search(r'EXPLANATION:\s*(.*?)(?=\n|$)', response, re.DOTALL | re.IGNORECASE)
-    return match.group(1).strip() if match else 'N/A'
-
 def extract_current_category_evaluation(response):
     match = re.search(r'CURRENT_CATEGORY_EVALUATION:\s*(.*?)(?=\n|$)', response, re.DOTALL | re.IGNORECASE)
     return match.group(1).strip() if match else 'N/A'
 
-def extract_confidence_justification(response):
-    match = re.search(r'CONFIDENCE_JUSTIFICATION:\s*(.*?)(?=\n|$)', response, re.DOTALL | re.IGNORECASE)
-    return match.group(1).strip() if match else 'N/A'
-
-def validate_category(category, category_type):
-    if category not in VALID_CATEGORIES:
-        logger.warning(f"Invalid {category_type} category '{category}' returned by AI. Defaulting to 'NEEDS FURTHER REVIEW'.")
-        return "NEEDS FURTHER REVIEW" if category_type == "primary" else "N/A"
-    return category
-
-def validate_confidence(confidence):
-    if confidence not in ["High", "Medium", "Low", "N/A"]:
-        logger.warning(f"Invalid confidence level '{confidence}' returned by AI. Defaulting to 'N/A'.")
-        return "N/A"
-    return confidence
-
 @error_handler
 def process_ai_response(response):
-    result = {
-        'Primary Category': 'NEEDS FURTHER REVIEW',
-        'Secondary Category': 'N/A',
-        'Confidence': 'N/A',
-        'Explanation': '',
-        'Confidence Justification': ''
-    }
-
-    result['Primary Category'] = validate_category(extract_category(response, "primary"), "primary")
-    result['Secondary Category'] = validate_category(extract_category(response, "secondary"), "secondary")
-    result['Confidence'] = validate_confidence(extract_confidence(response))
-    result['Explanation'] = extract_explanation(response)
-    result['Confidence Justification'] = extract_confidence_justification(response)
-
-    return result
+    return parse_response(response)
+
+def stop_streaming_response(chat_response):
+    # Closing the event stream ends the generation on the service side
+    close = getattr(chat_response.data, 'close', None)
+    if close is not None:
+        close()
 
 def error_handler(func):
     @functools.wraps(func)
@@ -305,7 +301,15 @@ def error_handler(func):
     return wrapper
 
 @error_handler
-def get_ai_response(url, chat_history, customer, webpage_content, relevant_data, generative_ai_inference_client):
+def get_ai_response(url, chat_history, customer, webpage_content, relevant_data, generative_ai_inference_client, key_content=None, stream=True,
+                    required_fields=STREAM_REQUIRED_FIELDS):
+    # Yields the response text as it arrives (one chunk when stream is False
+    # or the answer is cached), a FieldUpdate for each classification field
+    # once its line is complete, and then the processed result dict. Batch
+    # callers that only want the dict should pass stream=False, which sends
+    # a non-streaming request and skips the per-event parsing. When streaming
+    # with required_fields, the response is cut off as soon as those fields
+    # are in; the others are left 'N/A'.
     process_id = uuid.uuid4()
     logger.info(f"Processing AI response for URL: {url} (Process ID: {process_id})")
     
@@ -322,53 +326,87 @@ def get_ai_response(url, chat_history, customer, webpage_content, relevant_data,
     
     normalized_url = url
     
-    # Process the webpage_content dictionary
-    key_content = {
-        'source': 'website',
-        'home': {
-            'summary': extract_key_content(webpage_content.get('home', '')),
-            'top_keywords': extract_top_keywords(webpage_content.get('home', ''))
-        },
-        'about': {
-            'summary': extract_key_content(webpage_content.get('about', '')),
-            'top_keywords': extract_top_keywords(webpage_content.get('about', ''))
-        },
-        'combined_keywords': extract_top_keywords(webpage_content.get('home', '') + ' ' + webpage_content.get('about', '')),
-        'product_exists': 'products' in webpage_content or 'services' in webpage_content
-    }
+    # Process the webpage_content dictionary, unless a batch stage already did
+    if key_content is None:
+        key_content = build_key_content(webpage_content)
+    
+    # Only the summaries of the verticals the content resembles go into the prompt
+    verticals = candidate_verticals(webpage_content or {}) if PROMPT_TOP_K_VERTICALS > 0 else None
     
     content_source = 'website'
-    prompt = f"Content source: {content_source}\n" + construct_prompt(key_content, customer, relevant_data)
+    preamble, prompt = construct_prompt_parts(key_content, customer, relevant_data, content_source, verticals)
 
     logger.info(f"Preparing chat request... (Process ID: {process_id})")
-    chat_detail, prompt = prepare_chat_request(prompt, chat_history, True)
-    
-    logger.info(f"Sending chat request to AI service... (Process ID: {process_id})")
-    chat_response = send_chat_request(generative_ai_inference_client, chat_detail, prompt)
+    chat_detail, prompt = prepare_chat_request(prompt, chat_history, True, preamble, stream)
     
-    if chat_response is None:
-        logger.error(f"Failed to get response from OCI GenAI Service (Process ID: {process_id})")
+    # Identical requests (same model, parameters and prompt) are answered
+    # from the LLM cache without calling the service
+    cache_key = request_fingerprint(chat_detail)
+    parser = ResponseFieldParser(required_fields if stream else ())
+    stopped_early = False
+    full_response = lookup_response(cache_key)
+    if full_response is not None:
+        logger.info(f"Using cached AI response (Process ID: {process_id})")
+        yield full_response
+        yield from parser.feed(full_response)
+    elif is_cache_only():
+        logger.warning(f"No cached AI response for {url} and the LLM cache is in cache-only mode (Process ID: {process_id})")
         yield {
             'Primary Category': 'NEEDS FURTHER REVIEW',
             'Secondary Category': 'N/A',
             'Confidence': 'N/A',
-            'Explanation': 'Error: Failed to get response from OCI GenAI Service',
+            'Explanation': 'Not in the LLM cache (cache-only dry run)',
             'Confidence Justification': 'N/A'
         }
         return
-
-    logger.info(f"Processing streaming AI response... (Process ID: {process_id})")
-    full_response = ""
-    for chunk in process_streaming_response(chat_response):
-        if chunk is None:
-            logger.info(f"End of streaming response (Process ID: {process_id})")
-            break
-        full_response += chunk
-        logger.info(f"Yielding chunk: {chunk[:50]}...")  # Log first 50 characters of each chunk
-        yield chunk
+    else:
+        logger.info(f"Sending chat request to AI service... (Process ID: {process_id})")
+        chat_response = send_chat_request(generative_ai_inference_client, chat_detail, prompt)
+        
+        if chat_response is None:
+            logger.error(f"Failed to get response from OCI GenAI Service (Process ID: {process_id})")
+            yield {
+                'Primary Category': 'NEEDS FURTHER REVIEW',
+                'Secondary Category': 'N/A',
+                'Confidence': 'N/A',
+                'Explanation': 'Error: Failed to get response from OCI GenAI Service',
+                'Confidence Justification': 'N/A'
+            }
+            return
+
+        if stream:
+            logger.info(f"Processing streaming AI response... (Process ID: {process_id})")
+            full_response = ""
+            finished = False
+            for chunk in process_streaming_response(chat_response):
+                if chunk is None:
+                    logger.info(f"End of streaming response (Process ID: {process_id})")
+                    finished = True
+                    break
+                full_response += chunk
+                logger.debug(f"Yielding chunk: {chunk[:50]}...")  # Log first 50 characters of each chunk
+                yield chunk
+                yield from parser.feed(chunk)
+                if parser.complete:
+                    # A cut-off answer is not cached, finished stays False
+                    logger.info(f"Required fields received, stopping the response (Process ID: {process_id})")
+                    stop_streaming_response(chat_response)
+                    stopped_early = True
+                    break
+        else:
+            full_response = response_text(chat_response)
+            finished = True
+            yield full_response
+            yield from parser.feed(full_response)
+
+        # Only complete answers are worth replaying
+        if finished:
+            store_response(cache_key, full_response, {'customer': customer, 'url': url})
 
     logger.info(f"Processing AI response... (Process ID: {process_id})")
-    processed_response = process_ai_response(full_response)
+    # After an early stop the last line may be cut off, it is left 'N/A'
+    yield from parser.close(truncated=stopped_early)
+    processed_response = parser.result()
     
     logger.info(f"AI response processed. Primary Category: {processed_response['Primary Category']} (Process ID: {process_id})")
     
@@ -376,8 +414,9 @@ def get_ai_response(url, chat_history, customer, webpage_content, relevant_data,
 
 def extract_top_keywords(text, num_keywords=10):
     # Tokenize and remove stopwords
-    stop_words = set(stopwords.words('english'))
-    words = word_tokenize(text.lower())
+    stop_words = get_stop_words()
+    ensure_resource(sentence_tokenizer())
+    words = load_nltk().tokenize.word_tokenize(text.lower())
     words = [word for word in words if word.isalnum() and word not in stop_words]
     
     # Count word frequencies
@@ -1,20 +1,15 @@
 import streamlit as st
 from PIL import Image
-from setup_utils import setup_nltk, setup_logging
+from setup_utils import setup_logging
 from utils import setup_oci_client, error_handler
 from core_logic import categorize_business, process_csv_file, guidance_prompt
+from response_parser import FieldUpdate
 import os
 import logging
 from config import OCI_CONFIG_PROFILE, OCI_COMPARTMENT_ID
-import pandas as pd
 import uuid
 import re
 import time
-import plotly.express as px
-import plotly.graph_objects as go
-from wordcloud import WordCloud
-import matplotlib.pyplot as plt
-import networkx as nx
 import base64
 
 # Load your icon image
@@ -73,9 +68,6 @@ def main():
 # Setup logging
 logger = setup_logging()
 
-# Setup NLTK
-setup_nltk()
-
 # Setup OCI client
 @st.cache_resource
 def get_oci_client():
@@ -195,6 +187,7 @@ def process_interactive_chat(url_input, company_info):
     result_placeholder = st.empty()
     
     full_response = ""
+    fields = {}
     status_text.text("Processing... Please wait.")
     
     # Estimate total tokens for progress bar
@@ -226,6 +219,10 @@ def process_interactive_chat(url_input, company_info):
                 """)
                 # Clear the streaming placeholder
                 streaming_placeholder.empty()
+            elif isinstance(chunk, FieldUpdate):
+                # A field of the classification is complete, show it before the rest arrives
+                fields[chunk.field] = chunk.value
+                result_placeholder.markdown("#### Job Routing Classification:\n\n" + "\n\n".join(f"**{field}:** {value}" for field, value in fields.items()))
             elif isinstance(chunk, str):
                 # This is a chunk of the streaming response
                 full_response += chunk
@@ -271,6 +268,8 @@ def render_process_csv():
         uploaded_file = st.file_uploader("Choose a CSV file", type="csv", key="csv_uploader")
         
         if uploaded_file is not None:
+            # pandas is only needed once there is a CSV, not for every page load
+            import pandas as pd
             try:
                 df = pd.read_csv(uploaded_file)
                 if df.empty:
@@ -312,6 +311,7 @@ def process_uploaded_csv(uploaded_file):
             f.write(uploaded_file.getvalue())
         
         process_csv_file("temp_input.csv", output_file, generative_ai_inference_client, OCI_COMPARTMENT_ID, update_progress)
+        import pandas as pd
         st.session_state.processed_results = pd.read_csv(output_file)
         st.session_state.output_file_path = output_file
         st.session_state.csv_processed = True
@@ -380,7 +380,10 @@ def display_csv_results():
         else:
             st.info("No unmatched results found.")
 
-        # Add visualizations
+        # Add visualizations. Streamlit reruns this script on every
+        # interaction, so plotly is only imported once there is something to plot.
+        import pandas as pd
+        import plotly.express as px
         st.subheader("Visualizations")
 
         # 1. Confidence Distribution Pie Chart
@@ -415,6 +418,7 @@ def display_csv_results():
 
 
 def handle_csv_upload_error(e):
+    import pandas as pd
     if isinstance(e, pd.errors.EmptyDataError):
         st.error("The uploaded CSV file is empty. Please upload a file with data.")
     elif isinstance(e, pd.errors.ParserError):
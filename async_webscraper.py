@@ -0,0 +1,316 @@
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+import httpx
+from config import SCRAPER_MAX_CONCURRENCY, SCRAPER_PER_HOST_CONCURRENCY, SCRAPER_HTTP2, SCRAPER_RETRY_TOTAL, SCRAPER_DISCOVERY
+from config import SEARCH_MAX_CONCURRENCY, SCRAPER_WORK_THREADS
+from html_parser import parse_html
+from politeness import get_rate_limiter
+from sitemap import SitemapDiscovery, SITEMAP_CONTENT_TYPES
+from dns_cache import DeadDomain, install_resolver_cache, check_domain, dead_domain_reason, connect_failure_reason, record_connect_failure
+from http_cache import FetchedPage, OfflineCacheMiss, page_headers, lookup_for_fetch, record_revalidated, record_fetched
+from webscraper import (
+    RETRY_STATUSES,
+    note_response,
+    STREAM_CHUNK_SIZE,
+    ContentRejected,
+    scraper_metrics,
+    retry_delay,
+    check_response_headers,
+    decompress_content,
+    body_budget_reached,
+    browser_headers,
+    normalize_base_url,
+    default_pages,
+    analyze_homepage,
+    page_html,
+    extract_text_content,
+    forbidden_message,
+    fetch_error_message,
+    unexpected_error_message,
+    skipped_message,
+    new_website_content,
+    add_page_content,
+    apply_search_fallback,
+    duckduckgo_search,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _http2_available():
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        logger.warning("SCRAPER_HTTP2 is enabled but the 'h2' package is not installed. Falling back to HTTP/1.1.")
+        return False
+
+
+def dead_domain_error(error):
+    # Why a failed request means the domain is unreachable, or None
+    if isinstance(error, httpx.ConnectTimeout):
+        return 'connect timeout'
+    return connect_failure_reason(error)
+
+
+def host_key(url):
+    host = urlparse(url).netloc.lower()
+    return host[4:] if host.startswith('www.') else host
+
+
+class AsyncScraper:
+    # One event loop and one connection pool for a whole batch of websites.
+    # A global semaphore caps the number of in-flight requests, a per-host
+    # semaphore keeps us from hammering any single site and the shared host
+    # rate limiter paces requests over time.
+
+    def __init__(self, max_concurrency=SCRAPER_MAX_CONCURRENCY, per_host_concurrency=SCRAPER_PER_HOST_CONCURRENCY, http2=SCRAPER_HTTP2):
+        self.max_concurrency = max_concurrency
+        self.per_host_concurrency = per_host_concurrency
+        self.http2 = http2 and _http2_available()
+        self._client = None
+        self._global_limit = None
+        self._host_limits = {}
+        self._limiter = get_rate_limiter()
+        self._search_executor = None
+        self._work_executor = None
+
+    async def __aenter__(self):
+        install_resolver_cache()
+        limits = httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency)
+        self._client = httpx.AsyncClient(http2=self.http2, limits=limits, follow_redirects=True)
+        self._global_limit = asyncio.Semaphore(self.max_concurrency)
+        # Searches block for seconds at a time. On the loop's default
+        # executor a burst of them would take every thread, and with them
+        # the getaddrinfo calls of the whole batch.
+        self._search_executor = ThreadPoolExecutor(max_workers=SEARCH_MAX_CONCURRENCY, thread_name_prefix='search')
+        # SQLite cache reads and writes and HTML parsing block; with hundreds
+        # of fetches in flight they would serialize the batch on the loop
+        self._work_executor = ThreadPoolExecutor(max_workers=SCRAPER_WORK_THREADS, thread_name_prefix='scraper-work')
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self._client.aclose()
+        self._client = None
+        self._search_executor.shutdown(wait=False, cancel_futures=True)
+        self._search_executor = None
+        self._work_executor.shutdown(wait=False, cancel_futures=True)
+        self._work_executor = None
+
+    async def _offload(self, func, *args):
+        # Blocking work (cache lookups, parsing) on the work threads
+        return await asyncio.get_running_loop().run_in_executor(self._work_executor, functools.partial(func, *args))
+
+    def _host_limit(self, url):
+        key = host_key(url)
+        if key not in self._host_limits:
+            self._host_limits[key] = asyncio.Semaphore(self.per_host_concurrency)
+        return self._host_limits[key]
+
+    async def _trace(self, event_name, info):
+        if event_name == 'connection.connect_tcp.complete':
+            scraper_metrics.incr('connections_opened')
+
+    async def _get(self, url, headers, timeout):
+        # Streamed: only the headers have been read when this returns, and
+        # the caller has to aclose() the response
+        scraper_metrics.incr('requests_sent')
+        request = self._client.build_request('GET', url, headers=headers, timeout=timeout, extensions={'trace': self._trace})
+        return await self._client.send(request, stream=True)
+
+    async def _read_body(self, url, response, headers):
+        body = bytearray()
+        async for chunk in response.aiter_bytes(STREAM_CHUNK_SIZE):
+            body.extend(chunk)
+            if body_budget_reached(url, body, headers):
+                break
+        scraper_metrics.incr('bytes_downloaded', len(body))
+        return bytes(body)
+
+    async def _read_page(self, url, response, stale_page, allowed_types=None):
+        if response.status_code == 304 and stale_page is not None:
+            return await self._offload(record_revalidated, url, stale_page)
+        response.raise_for_status()
+
+        response_headers = page_headers(response.headers)
+        check_response_headers(url, response_headers, allowed_types)
+        content = await self._read_body(url, response, response_headers)
+        return await self._offload(record_fetched, url, FetchedPage(str(response.url), response.status_code, response_headers, content, False))
+
+    async def _rate_limit_key(self, url):
+        if self._limiter.by_ip:
+            # Resolving the host blocks, so keep it off the event loop
+            return await asyncio.get_running_loop().run_in_executor(None, self._limiter.key_for, url)
+        return self._limiter.key_for(url)
+
+    async def fetch_page(self, url, timeout=15, retries=SCRAPER_RETRY_TOTAL, allowed_types=None):
+        page, stale_page, cache_headers = await self._offload(lookup_for_fetch, url)
+        if page is not None:
+            return page
+        await self._offload(check_domain, url)
+
+        headers = browser_headers()
+        headers.update(cache_headers)
+        key = await self._rate_limit_key(url)
+
+        # Same policy as the pooled requests session: throttling responses
+        # slow the host down through the rate limiter, connection errors and
+        # RETRY_STATUSES are retried with exponential backoff
+        for attempt in range(retries + 1):
+            # Wait for the host's next slot before taking a global one, so a
+            # throttled host never holds up requests to other hosts
+            delay = self._limiter.reserve(key)
+            if delay:
+                scraper_metrics.incr('rate_limit_wait_seconds', delay)
+            await asyncio.sleep(delay)
+
+            response = None
+            async with self._global_limit:
+                async with self._host_limit(url):
+                    try:
+                        response = await self._get(url, headers, timeout)
+                    except httpx.TransportError:
+                        if attempt == retries:
+                            raise
+
+                    if response is not None:
+                        throttled = note_response(self._limiter, key, response.status_code, response.headers)
+                        try:
+                            if attempt == retries or not (throttled or response.status_code in RETRY_STATUSES):
+                                return await self._read_page(url, response, stale_page, allowed_types)
+                        finally:
+                            await response.aclose()
+                        logger.info(f"Retrying {url} after status {response.status_code} (attempt {attempt + 1}/{retries})")
+
+            if response is None or not throttled:
+                await asyncio.sleep(retry_delay(attempt, response.headers if response is not None else None))
+
+    async def _get_page(self, url, parse):
+        try:
+            return await self._offload(parse, await self.fetch_page(url))
+
+        except OfflineCacheMiss as e:
+            logger.error(str(e))
+            return None, fetch_error_message(url, e)
+
+        except ContentRejected as e:
+            logger.info(str(e))
+            return None, skipped_message(url, e.reason)
+
+        except DeadDomain as e:
+            logger.info(str(e))
+            return None, skipped_message(url, e.reason)
+
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 403:
+                logger.error(f"403 Forbidden error for URL: {url}")
+                return None, forbidden_message(url)
+            logger.error(f"Failed to fetch content from {url}: {str(e)}")
+            return None, fetch_error_message(url, e)
+
+        except httpx.HTTPError as e:
+            logger.error(f"Failed to fetch content from {url}: {str(e)}")
+            await self._offload(record_connect_failure, url, dead_domain_error(e))
+            return None, fetch_error_message(url, e)
+
+        except Exception as e:
+            logger.error(f"An unexpected error occurred while processing {url}: {e}")
+            return None, unexpected_error_message(url, e)
+
+    async def fetch_sitemap_file(self, url):
+        # robots.txt or a sitemap, or None when the site does not have one
+        try:
+            page = await self.fetch_page(url, allowed_types=SITEMAP_CONTENT_TYPES)
+            return decompress_content(page.content, page.headers.get('content-encoding', ''))
+        except httpx.HTTPError as e:
+            logger.info(f"Could not fetch {url}: {str(e)}")
+            await self._offload(record_connect_failure, url, dead_domain_error(e))
+        except (ContentRejected, OfflineCacheMiss, DeadDomain) as e:
+            logger.info(f"Could not fetch {url}: {str(e)}")
+        return None
+
+    async def discover_pages(self, base_url):
+        discovery = SitemapDiscovery(base_url)
+        url = discovery.next_url()
+        while url is not None:
+            await self._offload(discovery.feed, url, await self.fetch_sitemap_file(url))
+            url = discovery.next_url()
+        return discovery.pages()
+
+    async def scrape_homepage(self, base_url):
+        base_url = normalize_base_url(base_url)
+        logger.info(f"Identifying pages from base URL: {base_url}")
+        sitemap_pages = await self.discover_pages(base_url) if SCRAPER_DISCOVERY == 'sitemap' else None
+
+        def parse(page):
+            logger.info(f"Response status code: {page.status_code} (from cache: {page.from_cache})")
+            return analyze_homepage(page, base_url, sitemap_pages)
+
+        pages, home_content = await self._get_page(base_url, parse)
+        return pages or sitemap_pages or default_pages(base_url), home_content
+
+    async def fetch_webpage_content(self, url):
+        _, page_content = await self._get_page(url, lambda page: (None, extract_text_content(parse_html(page_html(page)), url)))
+        return page_content
+
+    async def _search_fallback(self, content, url, company_info):
+        loop = asyncio.get_running_loop()
+        search_content = await loop.run_in_executor(self._search_executor, duckduckgo_search, company_info)
+        return apply_search_fallback(content, url, search_content)
+
+    async def get_website_content(self, url, company_info):
+        logger.info(f"Fetching website content for URL: {url}")
+        content = new_website_content()
+
+        reason = await self._offload(dead_domain_reason, url)
+        if reason:
+            logger.info(f"Domain of {url} is known to be unreachable ({reason}), falling back to DuckDuckGo search...")
+            return await self._search_fallback(content, url, company_info)
+
+        pages, home_content = await self.scrape_homepage(url)
+
+        logger.info(f"Pages found: {pages}")
+
+        content_found = add_page_content(content, 'home', home_content)
+        if pages.get('about'):
+            if add_page_content(content, 'about', await self.fetch_webpage_content(pages['about'])):
+                content_found = True
+
+        content['product_exists'] = bool(pages.get('product'))
+
+        if not content_found:
+            logger.info("Falling back to DuckDuckGo search...")
+            await self._search_fallback(content, url, company_info)
+        else:
+            content['source'] = 'website'
+
+        return content
+
+    async def scrape(self, url, company_info):
+        if not url or not isinstance(url, str):
+            return None
+        try:
+            return await self.get_website_content(url, company_info)
+        except Exception as e:
+            logger.error(f"Error scraping {url}: {str(e)}")
+            return None
+
+
+async def _scrape_all(targets, **scraper_options):
+    async with AsyncScraper(**scraper_options) as scraper:
+        return await asyncio.gather(*[scraper.scrape(url, company_info) for url, company_info in targets])
+
+
+def scrape_websites(targets, **scraper_options):
+    # targets is a list of (url, company_info) pairs. Results come back in the
+    # same order, with None for targets that have no usable URL.
+    targets = list(targets)
+    logger.info(f"Scraping {len(targets)} websites (max concurrency: {scraper_options.get('max_concurrency', SCRAPER_MAX_CONCURRENCY)})")
+    return asyncio.run(_scrape_all(targets, **scraper_options))
+
+
+def scrape_website(url, company_info, **scraper_options):
+    return scrape_websites([(url, company_info)], **scraper_options)[0]
@@ -0,0 +1,394 @@
+import argparse
+import glob
+import json
+import os
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+import zlib
+
+# Micro-benchmarks for the hot paths of the scraper and classifier.
+# Run e.g. `python benchmarks.py parsers --pages-dir saved_pages/`.
+# Saved pages can be plain .html files or the on-disk HTTP cache from a
+# previous run (--http-cache cache/http_cache.sqlite).
+
+
+def load_saved_pages(pages_dir=None, http_cache_path=None, limit=None):
+    pages = []
+    if pages_dir:
+        for path in sorted(glob.glob(os.path.join(pages_dir, '*.htm*'))):
+            with open(path, 'rb') as f:
+                pages.append(f.read())
+    if http_cache_path:
+        conn = sqlite3.connect(http_cache_path)
+        try:
+            for (value,) in conn.execute("SELECT value FROM http_responses"):
+                pages.append(zlib.decompress(value))
+        finally:
+            conn.close()
+    if limit:
+        pages = pages[:limit]
+    if not pages:
+        sys.exit("No saved pages found. Pass --pages-dir and/or --http-cache.")
+    return pages
+
+
+def measure(func, items, repeat=1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for item in items:
+            func(item)
+    elapsed = time.perf_counter() - start
+    return elapsed, (len(items) * repeat) / elapsed if elapsed else float('inf')
+
+
+def report(title, rows):
+    print(f"\n{title}")
+    print(f"{'':<24}{'seconds':>12}{'items/sec':>14}")
+    for name, (elapsed, rate) in rows:
+        print(f"{name:<24}{elapsed:>12.3f}{rate:>14.1f}")
+
+
+def bench_parsers(args):
+    from html_parser import available_backends, parse_html, clean_text
+
+    pages = [page.decode('utf-8', errors='replace') for page in load_saved_pages(args.pages_dir, args.http_cache, args.limit)]
+
+    def run(backend):
+        def parse(html):
+            parsed_page = parse_html(html, backend)
+            parsed_page.links()
+            clean_text(parsed_page.text())
+        return parse
+
+    rows = [(backend, measure(run(backend), pages, args.repeat)) for backend in available_backends()]
+    report(f"HTML parsing, links + text ({len(pages)} pages x {args.repeat})", rows)
+
+
+def bench_links(args):
+    from html_parser import parse_html
+    from link_scorer import get_link_scorer
+    from webscraper import score_link
+
+    pages = load_saved_pages(args.pages_dir, args.http_cache, args.limit)
+    page_links = [[(href or '', text or '') for href, text in parse_html(page.decode('utf-8', errors='replace')).links()] for page in pages]
+    scorer = get_link_scorer()
+
+    mismatches = sum(
+        [score_link(text, href) for href, text in links] != scorer.score_links(links)
+        for links in page_links
+    )
+    rows = [
+        ('score_link', measure(lambda links: [score_link(text, href) for href, text in links], page_links, args.repeat)),
+        ('LinkScorer', measure(scorer.score_links, page_links, args.repeat)),
+    ]
+    total_links = sum(len(links) for links in page_links)
+    report(f"Link scoring ({len(page_links)} pages, {total_links} links x {args.repeat}), pages/sec", rows)
+    print(f"Pages with differing scores: {mismatches}")
+
+
+def legacy_decode(content):
+    # What decode_content did before the tiered decoder: chardet over the
+    # whole body whenever the server sent no charset
+    import chardet
+    encoding = chardet.detect(content)['encoding']
+    return content.decode(encoding or 'utf-8', errors='replace')
+
+
+def bench_charset(args):
+    from collections import Counter
+    from charset_detection import decode_html, detect_encoding
+
+    # No header charset, the case that used to send every page through chardet
+    pages = load_saved_pages(args.pages_dir, args.http_cache, args.limit)
+    rows = [
+        ('chardet, full body', measure(legacy_decode, pages, args.repeat)),
+        ('tiered decoder', measure(decode_html, pages, args.repeat)),
+    ]
+    report(f"Decoding pages without a header charset ({len(pages)} pages x {args.repeat})", rows)
+    print(f"Decided by: {dict(Counter(detect_encoding(page)[1] for page in pages))}")
+    mismatches = [(number, page) for number, page in enumerate(pages) if legacy_decode(page) != decode_html(page)]
+    print(f"Pages decoded differently: {len(mismatches)}")
+    for number, page in mismatches[:args.show]:
+        import chardet
+        legacy, tiered = legacy_decode(page), decode_html(page)
+        start = next((i for i, (a, b) in enumerate(zip(legacy, tiered)) if a != b), min(len(legacy), len(tiered)))
+        start = max(start - 20, 0)
+        print(f"  page {number}: chardet {chardet.detect(page)['encoding']} {legacy[start:start + 60]!r}")
+        print(f"  {' ' * len(f'page {number}:')} tiered {'/'.join(detect_encoding(page))} {tiered[start:start + 60]!r}")
+
+
+def legacy_extract_key_content(text, max_words=50000):
+    # extract_key_content before the linear rewrite, kept as the reference
+    import nltk
+    import string
+    from nltk.corpus import stopwords
+    from nltk.tokenize import word_tokenize, sent_tokenize
+
+    sentences = sent_tokenize(text)
+    stop_words = set(stopwords.words('english'))
+    words = [word.lower() for sentence in sentences for word in word_tokenize(sentence)
+             if word.lower() not in stop_words and word not in string.punctuation]
+    most_common = nltk.FreqDist(words).most_common(max_words)
+    key_sentences = [sentence for sentence in sentences if any(word[0] in sentence.lower() for word in most_common)]
+    words = ' '.join(key_sentences).split()
+    return ' '.join(words[:max_words]) if len(words) > max_words else ' '.join(key_sentences)
+
+
+def page_texts(args):
+    # Visible text of each saved page, capped like fetch_webpage_content does
+    from html_parser import parse_html, clean_text
+    from webscraper import MAX_CONTENT_CHARS
+
+    pages = load_saved_pages(args.pages_dir, args.http_cache, args.limit)
+    return [clean_text(parse_html(page.decode('utf-8', errors='replace')).text())[:MAX_CONTENT_CHARS] for page in pages]
+
+
+def bench_key_content(args):
+    from text_processing import extract_key_content
+
+    texts = page_texts(args)
+    rows = [
+        ('legacy', measure(legacy_extract_key_content, texts, args.repeat)),
+        ('linear', measure(extract_key_content, texts, args.repeat)),
+    ]
+    report(f"extract_key_content ({len(texts)} pages, {sum(map(len, texts))} chars x {args.repeat})", rows)
+    print(f"Pages with different output: {sum(legacy_extract_key_content(text) != extract_key_content(text) for text in texts)}")
+
+
+def bench_keywords(args):
+    from ai_interaction import extract_top_keywords
+    from text_processing import AnalyzedDocument
+    from keyword_ranking import batch_top_keywords
+
+    texts = page_texts(args)
+
+    def per_row(texts):
+        return [extract_top_keywords(text) for text in texts]
+
+    def batch(texts):
+        return batch_top_keywords([AnalyzedDocument(text).keyword_counts for text in texts])
+
+    counts = [AnalyzedDocument(text).keyword_counts for text in texts]
+    rows = [
+        ('per-row loop', measure(per_row, [texts], args.repeat)),
+        ('batch TF-IDF', measure(batch, [texts], args.repeat)),
+        ('ranking only, Counter', measure(lambda counts: [[word for word, _ in c.most_common(10)] for c in counts], [counts], args.repeat)),
+        ('ranking only, TF-IDF', measure(batch_top_keywords, [counts], args.repeat)),
+    ]
+    report(f"Top keywords for a batch of {len(texts)} pages (x {args.repeat}), batches/sec", rows)
+
+
+def keyword_scan_scores(text):
+    # One `in` test per keyword and vertical, as the prompt keywords were checked before VerticalIndex
+    from constants import VERTICAL_SUMMARIES
+    from config import VERTICAL_TIER1_WEIGHT, VERTICAL_TIER2_WEIGHT, VERTICAL_TIER3_WEIGHT, VERTICAL_NEGATIVE_PENALTY
+
+    weights = {'tier1': VERTICAL_TIER1_WEIGHT, 'tier2': VERTICAL_TIER2_WEIGHT, 'tier3': VERTICAL_TIER3_WEIGHT, 'negative': -VERTICAL_NEGATIVE_PENALTY}
+    text = text.lower()
+    return {
+        vertical: sum(weights[tier] for tier, keywords in details['keywords'].items() for keyword in keywords if keyword.lower() in text)
+        for vertical, details in VERTICAL_SUMMARIES.items()
+    }
+
+
+def bench_verticals(args):
+    from vertical_index import get_vertical_index
+
+    index = get_vertical_index()
+    texts = page_texts(args)
+    rows = [
+        ('keyword scan', measure(keyword_scan_scores, texts, args.repeat)),
+        ('VerticalIndex', measure(index.score, texts, args.repeat)),
+    ]
+    report(f"Vertical keyword scores ({len(texts)} pages, {sum(map(len, texts))} chars x {args.repeat})", rows)
+    # The scan also counts keywords inside longer words ("ngo" in "mongodb"), so some difference is expected
+    print(f"Pages with different scores: {sum(keyword_scan_scores(text) != index.score(text) for text in texts)}")
+
+
+SAMPLE_RESPONSE = """PRIMARY_CATEGORY: Software
+
+SECONDARY_CATEGORY: Services
+
+CONFIDENCE: High
+
+CONFIDENCE_JUSTIFICATION: Strong alignment with the Software vertical description, supported by several Tier 1 keywords and a clear focus on subscription software.
+
+EXPLANATION: The company builds and sells a cloud platform to other businesses on a subscription basis. Its homepage and about page describe product features, integrations and pricing tiers, which match the Software vertical. Implementation and support services complement the product.
+
+REASONING: Services was considered because of the consulting offering, but it supports the software rather than standing on its own.
+
+CURRENT_CATEGORY_EVALUATION: No current category was provided.
+"""
+
+
+class FakeChatClient:
+    # Stands in for GenerativeAiInferenceClient: answers every request with
+    # SAMPLE_RESPONSE, as server-sent events of a few characters each or as
+    # one non-streaming result
+    def __init__(self, chunk_size=4):
+        from types import SimpleNamespace
+        self._namespace = SimpleNamespace
+        chunks = [SAMPLE_RESPONSE[i:i + chunk_size] for i in range(0, len(SAMPLE_RESPONSE), chunk_size)]
+        self.events = [SimpleNamespace(data=json.dumps({'text': chunk})) for chunk in chunks]
+        self.events.append(SimpleNamespace(data=json.dumps({'finishReason': 'COMPLETE', 'text': ''})))
+        self.events_read = 0
+
+    def stream(self):
+        for event in self.events:
+            self.events_read += 1
+            yield event
+
+    def chat(self, chat_detail):
+        Namespace = self._namespace
+        if chat_detail.chat_request.is_stream:
+            return Namespace(data=Namespace(events=self.stream))
+        return Namespace(data=Namespace(chat_response=Namespace(text=SAMPLE_RESPONSE)))
+
+
+def bench_chat(args):
+    # CPU cost of get_ai_response per row with the service replaced by
+    # FakeChatClient, logging at INFO to a discarded stream like a real run
+    import logging
+    from ai_interaction import get_ai_response
+    from llm_cache import configure_llm_cache
+
+    configure_llm_cache(enabled=False)
+    handler = logging.StreamHandler(open(os.devnull, 'w'))
+    logging.getLogger().addHandler(handler)
+    logging.getLogger().setLevel(logging.INFO)
+
+    client = FakeChatClient()
+    key_content = {
+        'home': {'summary': 'Cloud platform for teams.', 'top_keywords': ['cloud', 'platform']},
+        'about': {'summary': 'Founded in 2010.', 'top_keywords': ['founded']},
+        'combined_keywords': ['cloud', 'platform'],
+        'product_exists': True,
+    }
+    relevant_data = {'Customer': 'Acme', 'Maximum of City': '', 'Maximum of Country': '', 'Maximum of State/Province': '', 'Web Address': 'acme.example'}
+
+    def row(stream, required_fields=()):
+        for chunk in get_ai_response('acme.example', [], 'Acme', {}, relevant_data, client, key_content, stream=stream,
+                                     required_fields=required_fields):
+            if isinstance(chunk, dict):
+                return chunk
+
+    rows = [
+        ('streaming', measure(lambda _: row(True), range(args.rows))),
+        ('non-streaming', measure(lambda _: row(False), range(args.rows))),
+    ]
+    client.events_read = 0
+    rows.append(('streaming, early stop', measure(lambda _: row(True, args.required_fields), range(args.rows))))
+    logging.getLogger().removeHandler(handler)
+    report(f"get_ai_response per row ({args.rows} rows, {len(client.events)} stream events per response)", rows)
+    print(f"Early stop after {', '.join(args.required_fields)} read {client.events_read / args.rows:.0f} events per response")
+
+
+def import_times(module):
+    # (cumulative seconds, [(direct import, cumulative seconds)]) of
+    # `import module` in a fresh interpreter, from the -X importtime report
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    # Imports are reported after everything they import, nested two spaces
+    # deeper; the direct imports of a top level module are the entries at
+    # depth 1 since the previous top level one
+    direct = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if not cumulative.strip().isdigit():
+            continue
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        seconds = int(cumulative) / 1e6
+        if depth == 0:
+            if name.strip() == module:
+                return seconds, direct
+            direct = []
+        elif depth == 1:
+            direct.append((name.strip(), seconds))
+    sys.exit(f"import {module} is missing from the -X importtime report")
+
+
+def bench_imports(args):
+    # Fails (exit status 1) when importing any of the modules takes longer
+    # than --budget or fails. The defaults are the entry points: the CLI,
+    # the Streamlit app with everything it imports at module level, and the
+    # shared core.
+    over_budget = []
+    for module in args.module or ['greg11', 'app', 'core_logic']:
+        try:
+            runs = [import_times(module) for _ in range(args.repeat)]
+        except RuntimeError as e:
+            print(f"\nimport {module} failed: {e}")
+            over_budget.append(f"{module} (import failed)")
+            continue
+        total = statistics.median(seconds for seconds, _ in runs)
+        print(f"\nimport {module}: {total:.3f}s (median of {args.repeat}, budget {args.budget:.3f}s)")
+        for name, seconds in sorted(runs[-1][1], key=lambda item: -item[1])[:args.top]:
+            print(f"  {name:<40}{seconds:>8.3f}s")
+        if total > args.budget:
+            over_budget.append(f"{module} ({total:.3f}s)")
+    if over_budget:
+        sys.exit(f"\nOver the import time budget of {args.budget:.3f}s or failing: {', '.join(over_budget)}")
+
+
+def add_page_arguments(parser):
+    parser.add_argument('--pages-dir', help="Directory of saved .html pages")
+    parser.add_argument('--http-cache', help="Path to an HTTP cache database to read pages from")
+    parser.add_argument('--limit', type=int, help="Use at most this many pages")
+    parser.add_argument('--repeat', type=int, default=3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Job routing micro-benchmarks")
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    parsers = subparsers.add_parser('parsers', help="Pages/sec for each installed HTML parser backend")
+    add_page_arguments(parsers)
+    parsers.set_defaults(func=bench_parsers)
+
+    links = subparsers.add_parser('links', help="score_link against the precompiled LinkScorer")
+    add_page_arguments(links)
+    links.set_defaults(func=bench_links)
+
+    charset = subparsers.add_parser('charset', help="Full-body chardet against the tiered charset decoder")
+    add_page_arguments(charset)
+    charset.add_argument('--show', type=int, default=20, help="Mismatching pages to print")
+    charset.set_defaults(func=bench_charset)
+
+    key_content = subparsers.add_parser('key-content', help="Legacy against linear-time extract_key_content on page text")
+    add_page_arguments(key_content)
+    key_content.set_defaults(func=bench_key_content)
+
+    keywords = subparsers.add_parser('keywords', help="Per-row extract_top_keywords against batch TF-IDF keywords")
+    add_page_arguments(keywords)
+    keywords.set_defaults(func=bench_keywords)
+
+    verticals = subparsers.add_parser('verticals', help="Per-keyword scans against the compiled VerticalIndex")
+    add_page_arguments(verticals)
+    verticals.set_defaults(func=bench_verticals)
+
+    chat = subparsers.add_parser('chat', help="Per-row CPU cost of streaming against non-streaming AI requests")
+    chat.add_argument('--rows', type=int, default=500)
+    chat.add_argument('--required-fields', type=lambda value: value.upper().split(','), default=['PRIMARY_CATEGORY', 'SECONDARY_CATEGORY', 'CONFIDENCE'],
+                      help="Fields the early-stop run waits for (comma-separated)")
+    chat.set_defaults(func=bench_chat)
+
+    imports = subparsers.add_parser('imports', help="Cold start import time of the entry points, fails over --budget")
+    imports.add_argument('--module', action='append', help="Module to import, repeatable (default: greg11, app and core_logic)")
+    imports.add_argument('--budget', type=float, default=0.5, help="Maximum median import time in seconds")
+    imports.add_argument('--top', type=int, default=8, help="Number of heaviest direct imports to show")
+    imports.add_argument('--repeat', type=int, default=3)
+    imports.set_defaults(func=bench_imports)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+import codecs
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# How far into the page to look for <meta charset>, and how much of it to
+# hand to statistical detection
+META_SCAN_BYTES = 4096
+DETECT_SAMPLE_BYTES = 16 * 1024
+
+NON_ASCII_BYTE = re.compile(rb'[\x80-\xff]')
+
+# The utf-8-sig/16/32 codecs strip the BOM themselves. UTF-32 LE has to be
+# checked before UTF-16 LE, whose BOM it starts with.
+BOMS = [
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+# Both <meta charset="..."> and <meta http-equiv="Content-Type" content="text/html; charset=...">
+META_CHARSET = re.compile(rb'<meta[^>]+?charset\s*=\s*["\']?\s*([a-zA-Z0-9_.:-]+)', re.IGNORECASE)
+
+# Servers and templates send these by default without knowing what the page
+# is in, so they only win once UTF-8 has been ruled out. Browsers read all of
+# them as windows-1252. (Python codec names, as returned by normalize_charset.)
+WEAK_CHARSETS = {'iso8859-1', 'ascii', 'cp1252'}
+
+# The single- and multi-byte encodings of the WHATWG Encoding Standard, i.e.
+# what web pages are actually written in (Python codec names). Detectors
+# also know DOS and EBCDIC code pages, which on a mostly-ASCII page win on
+# a handful of bytes and garble it. Anything outside this list is read as
+# windows-1252, as browsers do.
+WEB_ENCODINGS = {
+    'utf-8', 'cp866', 'iso8859-2', 'iso8859-3', 'iso8859-4', 'iso8859-5', 'iso8859-6', 'iso8859-7', 'iso8859-8',
+    'iso8859-10', 'iso8859-13', 'iso8859-14', 'iso8859-15', 'iso8859-16', 'koi8-r', 'koi8-u', 'mac-roman',
+    'mac-cyrillic', 'cp874', 'cp1250', 'cp1251', 'cp1252', 'cp1253', 'cp1254', 'cp1255', 'cp1256', 'cp1257',
+    'cp1258', 'gbk', 'gb2312', 'gb18030', 'big5', 'big5hkscs', 'euc_jp', 'iso2022_jp', 'shift_jis', 'cp932',
+    'euc_kr', 'cp949',
+}
+DEFAULT_WEB_ENCODING = 'cp1252'
+
+
+def normalize_charset(name):
+    # Python codec name for a charset label, or None if Python does not know it
+    if not name:
+        return None
+    try:
+        return codecs.lookup(name.strip().strip('"\'')).name
+    except LookupError:
+        return None
+
+
+def bom_encoding(content):
+    for bom, encoding in BOMS:
+        if content.startswith(bom):
+            return encoding
+    return None
+
+
+def meta_encoding(content):
+    match = META_CHARSET.search(content[:META_SCAN_BYTES])
+    if not match:
+        return None
+    encoding = normalize_charset(match.group(1).decode('ascii', errors='ignore'))
+    # A page whose markup we could read as ASCII is not really UTF-16/32
+    if encoding and encoding.startswith(('utf-16', 'utf-32')):
+        return 'utf-8'
+    return encoding
+
+
+def is_utf8(content):
+    try:
+        content.decode('utf-8')
+        return True
+    except UnicodeDecodeError as e:
+        # A body cut off at SCRAPER_MAX_BYTES may end in the middle of a
+        # character. Only give it the benefit of the doubt when there is valid
+        # UTF-8 beyond ASCII before the cut; a lone high byte at the end of a
+        # windows-1252 page looks just the same.
+        return (e.reason == 'unexpected end of data' and e.start >= len(content) - 3
+                and NON_ASCII_BYTE.search(content, 0, e.start) is not None)
+
+
+def detection_sample(content):
+    # Pages often open with kilobytes of ASCII markup and scripts, which tell
+    # a detector nothing, so sample from the first non-ASCII byte onwards
+    match = NON_ASCII_BYTE.search(content)
+    start = max(match.start() - 1024, 0) if match else 0
+    return content[start:start + DETECT_SAMPLE_BYTES]
+
+
+def web_encoding(candidates):
+    # candidates are the detector's matches, best first, each a list of
+    # encodings that decode the sample the same way. Picks the first match
+    # with an encoding web pages use, and windows-1252 out of a match that
+    # has it, like a browser would.
+    for names in candidates:
+        encodings = [normalize_charset(name) for name in names]
+        if DEFAULT_WEB_ENCODING in encodings or 'iso8859-1' in encodings:
+            return DEFAULT_WEB_ENCODING
+        for encoding in encodings:
+            if encoding in WEB_ENCODINGS:
+                return encoding
+    return None
+
+
+def statistical_encoding(sample):
+    # charset_normalizer ships with requests and is much faster than the
+    # pure-Python chardet releases; chardet is asked when it is not
+    # installed or has no answer. Returns DEFAULT_WEB_ENCODING when neither
+    # finds an encoding in WEB_ENCODINGS.
+    encoding = None
+    try:
+        from charset_normalizer import from_bytes
+        encoding = web_encoding([match.encoding, *match.could_be_from_charset] for match in from_bytes(sample))
+    except ImportError:
+        pass
+    if encoding is None:
+        try:
+            import chardet
+            encoding = web_encoding([[chardet.detect(sample)['encoding']]])
+        except ImportError:
+            pass
+    return encoding or DEFAULT_WEB_ENCODING
+
+
+def detect_encoding(content, header_charset=None):
+    # Returns (encoding, source), trying the cheap and reliable signals first:
+    # byte order mark, Content-Type header, <meta charset>, strict UTF-8, and
+    # only then statistical detection on DETECT_SAMPLE_BYTES of the page.
+    encoding = bom_encoding(content)
+    if encoding:
+        return encoding, 'bom'
+
+    header = normalize_charset(header_charset)
+    if header and header not in WEAK_CHARSETS:
+        return header, 'header'
+
+    encoding = meta_encoding(content)
+    if encoding and encoding not in WEAK_CHARSETS:
+        return encoding, 'meta'
+
+    if is_utf8(content):
+        return 'utf-8', 'utf-8'
+
+    if header or encoding:
+        return 'cp1252', 'header' if header else 'meta'
+
+    return statistical_encoding(detection_sample(content)), 'detected'
+
+
+def decode_html(content, header_charset=None):
+    encoding, source = detect_encoding(content, header_charset)
+    logger.debug(f"Decoding page as {encoding} (from {source})")
+    return content.decode(encoding, errors='replace')
@@ -24,4 +24,112 @@ MAX_TOKENS = int(os.getenv('MAX_TOKENS', 4000))
 TEMPERATURE = float(os.getenv('TEMPERATURE', 0))
 FREQUENCY_PENALTY = float(os.getenv('FREQUENCY_PENALTY', 0))
 TOP_P = float(os.getenv('TOP_P', 0))
-TOP_K = int(os.getenv('TOP_K', 0))
\ No newline at end of file
+TOP_K = int(os.getenv('TOP_K', 0))
+# Send the instructions and vertical summaries, which are the same for every
+# row, as the chat preamble and only the company block as the message
+PROMPT_STATIC_PREAMBLE = os.getenv('PROMPT_STATIC_PREAMBLE', 'false').lower() == 'true'
+# Only put the summaries of the PROMPT_TOP_K_VERTICALS verticals most similar to
+# the website in the prompt, plus any scoring within PROMPT_VERTICAL_MARGIN (a
+# fraction) of the last one, and General Business. 0 sends all of them.
+PROMPT_TOP_K_VERTICALS = int(os.getenv('PROMPT_TOP_K_VERTICALS', 0))
+PROMPT_VERTICAL_MARGIN = float(os.getenv('PROMPT_VERTICAL_MARGIN', 0.2))
+# Comma-separated response labels, e.g. PRIMARY_CATEGORY,SECONDARY_CATEGORY,CONFIDENCE.
+# A streamed response is cut off once all of them are in; empty reads it all.
+STREAM_REQUIRED_FIELDS = [field.strip().upper() for field in os.getenv('STREAM_REQUIRED_FIELDS', '').split(',') if field.strip()]
+
+# Scraper Configuration
+SCRAPER_ASYNC = os.getenv('SCRAPER_ASYNC', 'true').lower() == 'true'
+# Scrape and classify rows that share a registrable domain only once
+DEDUPLICATE_DOMAINS = os.getenv('DEDUPLICATE_DOMAINS', 'true').lower() == 'true'
+# How process_csv ranks page keywords for the prompt: 'tfidf' across the whole
+# batch of scraped websites, or 'frequency' within each page
+KEYWORD_RANKING = os.getenv('KEYWORD_RANKING', 'tfidf')
+SCRAPER_MAX_CONCURRENCY = int(os.getenv('SCRAPER_MAX_CONCURRENCY', 500))
+SCRAPER_PER_HOST_CONCURRENCY = int(os.getenv('SCRAPER_PER_HOST_CONCURRENCY', 4))
+# Threads the async scraper hands HTTP cache lookups and HTML parsing to, off the event loop
+SCRAPER_WORK_THREADS = int(os.getenv('SCRAPER_WORK_THREADS', 8))
+SCRAPER_HTTP2 = os.getenv('SCRAPER_HTTP2', 'false').lower() == 'true'
+SCRAPER_POOL_CONNECTIONS = int(os.getenv('SCRAPER_POOL_CONNECTIONS', 100))
+SCRAPER_POOL_MAXSIZE = int(os.getenv('SCRAPER_POOL_MAXSIZE', 20))
+SCRAPER_RETRY_TOTAL = int(os.getenv('SCRAPER_RETRY_TOTAL', 3))
+SCRAPER_RETRY_BACKOFF = float(os.getenv('SCRAPER_RETRY_BACKOFF', 0.5))
+SCRAPER_RETRY_AFTER_MAX = float(os.getenv('SCRAPER_RETRY_AFTER_MAX', 30))
+
+# Per-host politeness: requests per second and burst allowed per host. A 429/503
+# halves the host's rate (down to 1/SCRAPER_HOST_MAX_PENALTY of it) and honours Retry-After.
+SCRAPER_HOST_RATE = float(os.getenv('SCRAPER_HOST_RATE', '2.0'))
+SCRAPER_HOST_BURST = int(os.getenv('SCRAPER_HOST_BURST', '4'))
+SCRAPER_HOST_MAX_PENALTY = float(os.getenv('SCRAPER_HOST_MAX_PENALTY', '32'))
+# Share one budget between hosts that resolve to the same IP (e.g. shared hosting)
+SCRAPER_RATE_LIMIT_BY_IP = os.getenv('SCRAPER_RATE_LIMIT_BY_IP', 'false').lower() == 'true'
+SCRAPER_MAX_BYTES = int(os.getenv('SCRAPER_MAX_BYTES', 2 * 1024 * 1024))
+SCRAPER_ALLOWED_CONTENT_TYPES = [content_type.strip() for content_type in os.getenv('SCRAPER_ALLOWED_CONTENT_TYPES', 'text/html,application/xhtml+xml').split(',')]
+# How the about/product pages are found: 'links' scores every homepage link,
+# 'sitemap' reads robots.txt/sitemap.xml first and only scores links without a sitemap
+SCRAPER_DISCOVERY = os.getenv('SCRAPER_DISCOVERY', 'links')
+SITEMAP_MAX_FILES = int(os.getenv('SITEMAP_MAX_FILES', 3))
+
+# Link scoring for homepage page discovery: comma-separated keywords matched in
+# link text (LINK_TEXT_WEIGHT points) and URLs (LINK_HREF_WEIGHT points)
+LINK_ABOUT_KEYWORDS = [keyword.strip().lower() for keyword in os.getenv('LINK_ABOUT_KEYWORDS', 'about,about us,who we are,our story,mission,vision,values,team,company').split(',') if keyword.strip()]
+LINK_PRODUCT_KEYWORDS = [keyword.strip().lower() for keyword in os.getenv('LINK_PRODUCT_KEYWORDS', 'product,products,solutions,services,offerings').split(',') if keyword.strip()]
+LINK_AVOID_KEYWORDS = [keyword.strip().lower() for keyword in os.getenv('LINK_AVOID_KEYWORDS', 'contact,blog,news,careers,jobs,login,sign').split(',') if keyword.strip()]
+LINK_TEXT_WEIGHT = int(os.getenv('LINK_TEXT_WEIGHT', 2))
+LINK_HREF_WEIGHT = int(os.getenv('LINK_HREF_WEIGHT', 1))
+LINK_SHORT_URL_BONUS = int(os.getenv('LINK_SHORT_URL_BONUS', 1))
+LINK_AVOID_PENALTY = int(os.getenv('LINK_AVOID_PENALTY', 2))
+
+# NLTK data: looked up in NLTK_DATA_DIR first (e.g. a bundle made with
+# `python nltk_resources.py --dir <dir>`), downloaded there on first use if missing
+NLTK_DATA_DIR = os.getenv('NLTK_DATA_DIR', '~/.nltk_data')
+NLTK_DOWNLOAD = os.getenv('NLTK_DOWNLOAD', 'true').lower() == 'true'
+
+# LLM Cache Configuration: AI responses keyed by a hash of the model, generation
+# parameters and prompt. LLM_CACHE_ONLY is a dry run that never calls the service.
+LLM_CACHE_ENABLED = os.getenv('LLM_CACHE_ENABLED', 'true').lower() == 'true'
+LLM_CACHE_ONLY = os.getenv('LLM_CACHE_ONLY', 'false').lower() == 'true'
+LLM_CACHE_PATH = os.getenv('LLM_CACHE_PATH', 'cache/llm_cache.sqlite')
+LLM_CACHE_TTL = int(os.getenv('LLM_CACHE_TTL', 30 * 24 * 3600))
+LLM_CACHE_MAX_BYTES = int(os.getenv('LLM_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+
+# HTTP Cache Configuration
+HTTP_CACHE_ENABLED = os.getenv('HTTP_CACHE_ENABLED', 'false').lower() == 'true'
+HTTP_CACHE_PATH = os.getenv('HTTP_CACHE_PATH', 'cache/http_cache.sqlite')
+HTTP_CACHE_TTL = int(os.getenv('HTTP_CACHE_TTL', 7 * 24 * 3600))
+HTTP_CACHE_MAX_BYTES = int(os.getenv('HTTP_CACHE_MAX_BYTES', 1024 * 1024 * 1024))
+SCRAPER_OFFLINE = os.getenv('SCRAPER_OFFLINE', 'false').lower() == 'true'
+
+# DNS Cache Configuration
+DNS_CACHE_TTL = int(os.getenv('DNS_CACHE_TTL', 300))
+DNS_NEGATIVE_TTL = int(os.getenv('DNS_NEGATIVE_TTL', 60))
+# Domains that failed DNS, refused connections or timed out; ':memory:' keeps them for one run only
+DEAD_DOMAIN_CACHE_PATH = os.getenv('DEAD_DOMAIN_CACHE_PATH', 'cache/dead_domains.sqlite')
+DEAD_DOMAIN_TTL = int(os.getenv('DEAD_DOMAIN_TTL', 7 * 24 * 3600))
+# Timeouts and refused connections can be a problem on our side (VPN, uplink)
+# or a host restarting, so they are only remembered for this long
+DEAD_DOMAIN_TRANSIENT_TTL = int(os.getenv('DEAD_DOMAIN_TRANSIENT_TTL', 3600))
+
+# Search fallback for rows whose website gave us nothing: duckduckgo, local or none.
+# The local backend reads canned results from SEARCH_LOCAL_PATH (.json or SQLite).
+SEARCH_BACKEND = os.getenv('SEARCH_BACKEND', 'duckduckgo')
+SEARCH_LOCAL_PATH = os.getenv('SEARCH_LOCAL_PATH', '')
+SEARCH_TIMEOUT = float(os.getenv('SEARCH_TIMEOUT', 10))
+SEARCH_MAX_CONCURRENCY = int(os.getenv('SEARCH_MAX_CONCURRENCY', 2))
+SEARCH_CACHE_ENABLED = os.getenv('SEARCH_CACHE_ENABLED', 'true').lower() == 'true'
+SEARCH_CACHE_PATH = os.getenv('SEARCH_CACHE_PATH', 'cache/search_cache.sqlite')
+SEARCH_CACHE_TTL = int(os.getenv('SEARCH_CACHE_TTL', 30 * 24 * 3600))
+
+# Local vertical scoring from the VERTICAL_SUMMARIES keyword tiers: points per
+# distinct keyword found on a page, and the penalty for each negative keyword
+VERTICAL_TIER1_WEIGHT = float(os.getenv('VERTICAL_TIER1_WEIGHT', 3))
+VERTICAL_TIER2_WEIGHT = float(os.getenv('VERTICAL_TIER2_WEIGHT', 2))
+VERTICAL_TIER3_WEIGHT = float(os.getenv('VERTICAL_TIER3_WEIGHT', 1))
+VERTICAL_NEGATIVE_PENALTY = float(os.getenv('VERTICAL_NEGATIVE_PENALTY', 2))
+# Classify rows locally from those scores, without the AI, when the best
+# vertical scores at least FAST_PATH_MIN_SCORE and leads by FAST_PATH_MARGIN
+FAST_PATH_ENABLED = os.getenv('FAST_PATH_ENABLED', 'false').lower() == 'true'
+FAST_PATH_MIN_SCORE = float(os.getenv('FAST_PATH_MIN_SCORE', 6))
+FAST_PATH_MARGIN = float(os.getenv('FAST_PATH_MARGIN', 4))
+
+# HTML parser backend: auto, selectolax, lxml or html.parser
+HTML_PARSER_BACKEND = os.getenv('HTML_PARSER_BACKEND', 'auto')
\ No newline at end of file
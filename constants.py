@@ -9,7 +9,7 @@ VALID_CATEGORIES = [
     "Restaurant and Hospitality",
     "Retail",
     "Software",
-    "Wholesale Distribution"
+    "Wholesale Distribution",
     "Campus Stores",    
     "Services",     
 ]
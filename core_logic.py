@@ -1,10 +1,12 @@
 from url_utils import normalize_url, extract_url_from_input
 from utils import error_handler
 from webscraper import get_website_content
+from async_webscraper import scrape_website
 from ai_interaction import get_ai_response
 from csv_processing import process_csv
+from nltk_resources import warm_up
+from config import SCRAPER_ASYNC
 import logging
-import pandas as pd
 
 logger = logging.getLogger(__name__)
 
@@ -14,13 +16,17 @@ guidance_prompt = """You are a helpful AI assistant tasked with categorizing bus
 @error_handler
 def categorize_business(url_input, company_info, generative_ai_inference_client, chat_history):
     logger.info(f"Starting categorization for URL: {url_input}")
+    warm_up()
     url = extract_url_from_input(url_input)
     if url:
         normalized_url = normalize_url(url)
         if not normalized_url.startswith(('http://', 'https://')):
             normalized_url = 'https://' + normalized_url
         logger.info(f"Extracted and normalized URL: {normalized_url}")
-        webpage_content = get_website_content(normalized_url, company_info)
+        if SCRAPER_ASYNC:
+            webpage_content = scrape_website(normalized_url, company_info)
+        else:
+            webpage_content = get_website_content(normalized_url, company_info)
         
         relevant_data = {
             'Customer': company_info,
@@ -35,7 +41,7 @@ def categorize_business(url_input, company_info, generative_ai_inference_client,
             if isinstance(chunk, dict):
                 logger.info(f"Yielding final response: {chunk}")
             else:
-                logger.info(f"Yielding chunk from get_ai_response: {chunk[:50] if isinstance(chunk, str) else 'Non-string chunk'}...")
+                logger.debug(f"Yielding chunk from get_ai_response: {chunk[:50] if isinstance(chunk, str) else 'Non-string chunk'}...")
             yield chunk
     else:
         logger.warning("No valid URL detected.")
@@ -56,6 +62,7 @@ def process_csv_file(input_file, output_file, generative_ai_inference_client, co
     if progress_callback:
         progress_callback(0)
     
+    import pandas as pd
     try:
         df = pd.read_csv(input_file)
     except Exception as e:
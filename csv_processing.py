@@ -1,17 +1,82 @@
 import csv
 import os
 import logging
-import pandas as pd
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from ai_interaction import get_ai_response, process_ai_response
-from webscraper import get_website_content
-from text_processing import extract_key_content
+from webscraper import get_website_content, get_scraper_stats
+from async_webscraper import scrape_websites
+from http_cache import http_cache_metrics
+from dns_cache import dns_metrics
+from search_backends import search_metrics
+from llm_cache import llm_cache_metrics
+from text_processing import build_batch_key_content
+from fast_classifier import classify_locally, fast_path_summary
+from nltk_resources import warm_up
 from utils import setup_oci_client
+from url_utils import site_key
+from config import SCRAPER_ASYNC, DEDUPLICATE_DOMAINS, KEYWORD_RANKING, FAST_PATH_ENABLED
 
 logger = logging.getLogger(__name__)
 
+# Output columns that come from classifying a website, shared by every row of the same domain.
+# Classification Path records whether the keyword fast path or the AI produced the answer.
+CLASSIFICATION_COLUMNS = ['Primary Category', 'Secondary Category', 'Confidence', 'Explanation', 'Confidence Justification', 'Classification Path']
 
-def process_row(row, generative_ai_inference_client, chat_history):
+
+def match_label(primary_category, cs_sales_lob):
+    return 'Yes' if primary_category.lower() == cs_sales_lob.lower() else 'No'
+
+
+def group_rows_by_domain(rows):
+    # Lists of row indexes, one per website (see site_key) in first-seen
+    # order. Rows without a usable Web Address are never grouped.
+    groups = {}
+    for index, row in enumerate(rows):
+        domain = site_key(row.get('Web Address')) if DEDUPLICATE_DOMAINS else None
+        groups.setdefault(domain or ('row', index), []).append(index)
+    return list(groups.values())
+
+
+def fan_out_result(result, row):
+    # Copy a website's classification onto another row of the same domain,
+    # with Match? worked out against that row's own CS Sales LOB. The
+    # Explanation names the company it was written for, so another
+    # customer's row gets a note pointing at the shared website instead.
+    fanned = {**row, **{column: result.get(column, 'N/A') for column in CLASSIFICATION_COLUMNS}}
+    if row.get('Customer') != result.get('Customer'):
+        fanned['Explanation'] = f"Classified once for every row with the same website ({result.get('Web Address', 'N/A')})."
+    fanned['Match?'] = 'N/A'
+    if result.get('Match?', 'N/A') != 'N/A':
+        try:
+            fanned['Match?'] = match_label(fanned['Primary Category'], row.get('CS Sales LOB', ''))
+        except AttributeError:
+            pass
+    return fanned
+
+
+def scrape_row(target):
+    # get_website_content for the batch pre-pass; process_row scrapes again
+    # itself when this fails, so a row's error is still reported there
+    url, customer = target
+    if not isinstance(url, str) or not url.strip():
+        return None
+    try:
+        return get_website_content(url, customer)
+    except Exception as e:
+        logger.error(f"Error scraping {url} for {customer}: {str(e)}")
+        return None
+
+
+def scrape_batch(rows):
+    # Every website of the batch, scraped before the AI stage
+    targets = [(row.get('Web Address'), row.get('Customer')) for row in rows]
+    if SCRAPER_ASYNC:
+        return scrape_websites(targets)
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        return list(executor.map(scrape_row, targets))
+
+
+def process_row(row, generative_ai_inference_client, chat_history, webpage_content=None, key_content=None):
     # Define the fields we want to consider
     relevant_fields = ['Customer', 'Maximum of City', 'Maximum of Country', 'Maximum of State/Province', 'Web Address', 'CS Sales LOB']
     
@@ -31,14 +96,16 @@ def process_row(row, generative_ai_inference_client, chat_history):
             'Confidence': 'N/A', 
             'Explanation': f'NO URL FOUND for {customer}',
             'Confidence Justification': 'N/A',
-            'Match?': 'N/A'
+            'Match?': 'N/A',
+            'Classification Path': 'N/A'
         }
 
     try:
         logger.info(f"Processing customer: {customer} with URL: {url}")
 
-        # Get website content
-        webpage_content = get_website_content(url, customer)  
+        # Get website content, unless it was already scraped for the whole batch
+        if webpage_content is None:
+            webpage_content = get_website_content(url, customer)
 
         if not webpage_content:
             logger.warning(f"No content retrieved for {customer} (URL: {url})")
@@ -49,12 +116,24 @@ def process_row(row, generative_ai_inference_client, chat_history):
                 'Confidence': 'N/A', 
                 'Explanation': f'Unable to retrieve content for {customer} (URL: {url})',
                 'Confidence Justification': 'N/A',
-                'Match?': 'N/A'
+                'Match?': 'N/A',
+                'Classification Path': 'N/A'
             }
         
-        # Call get_ai_response without current_category
+        # Clear-cut websites are classified from their keywords, without an AI call
+        local_result = classify_locally(webpage_content) if FAST_PATH_ENABLED else None
+        if local_result is not None:
+            return {
+                **row,
+                **local_result,
+                'Match?': match_label(local_result['Primary Category'], cs_sales_lob),
+                'Classification Path': 'fast path'
+            }
+
+        # Call get_ai_response without current_category. Nobody watches a
+        # batch row stream in, so ask for the whole answer in one response.
         ai_response = None
-        for chunk in get_ai_response(url, chat_history, customer, webpage_content, relevant_data, generative_ai_inference_client):
+        for chunk in get_ai_response(url, chat_history, customer, webpage_content, relevant_data, generative_ai_inference_client, key_content, stream=False):
             if isinstance(chunk, dict):
                 ai_response = chunk
                 break
@@ -63,7 +142,7 @@ def process_row(row, generative_ai_inference_client, chat_history):
             raise ValueError("No valid response received from AI")
 
         primary_category = ai_response.get('Primary Category', 'N/A')
-        match = 'Yes' if primary_category.lower() == cs_sales_lob.lower() else 'No'
+        match = match_label(primary_category, cs_sales_lob)
 
         return {
             **row,
@@ -72,7 +151,8 @@ def process_row(row, generative_ai_inference_client, chat_history):
             'Confidence': ai_response.get('Confidence', 'N/A'),
             'Explanation': ai_response.get('Explanation', 'N/A'),
             'Confidence Justification': ai_response.get('Confidence Justification', 'N/A'),
-            'Match?': match
+            'Match?': match,
+            'Classification Path': 'llm'
         }
     except Exception as e:
         logger.error(f"Error processing row for {customer} (URL: {url}): {str(e)}", exc_info=True)
@@ -83,7 +163,8 @@ def process_row(row, generative_ai_inference_client, chat_history):
             'Confidence': 'N/A', 
             'Explanation': f'Error processing {customer} (URL: {url}): {str(e)}',
             'Confidence Justification': 'N/A',
-            'Match?': 'N/A'
+            'Match?': 'N/A',
+            'Classification Path': 'N/A'
         }
 
 
@@ -95,6 +176,8 @@ def process_csv(input_file, output_file, generative_ai_inference_client, compart
     if progress_callback:
         progress_callback(0)
     
+    # pandas is only needed for CSV batches, not for single lookups
+    import pandas as pd
     df = pd.read_csv(input_file)
     
     # Validate headers (keep your existing validation code here)
@@ -103,23 +186,54 @@ def process_csv(input_file, output_file, generative_ai_inference_client, compart
     logger.info(f"Total rows to process: {total_rows}")
     
     results = []
+    rows = [row.to_dict() for _, row in df.iterrows()]
+    
+    # Rows sharing a website are scraped and classified once, through the
+    # first row of their group
+    groups = group_rows_by_domain(rows)
+    representatives = [rows[group[0]] for group in groups]
+    logger.info(f"Domain deduplication: {len(groups)} unique websites for {total_rows} rows ({total_rows - len(groups)} rows saved)")
     
     # Step 2: Reading Websites
     if progress_callback:
         progress_callback(1)
     
+    # Load the NLTK data once, before any scraper or worker thread needs it
+    warm_up()
+    
+    # TF-IDF ranks keywords against every website of the batch, so all of
+    # them are scraped first, whichever scraper is used. The async scraper
+    # always scrapes up front, from a single event loop; otherwise rows are
+    # scraped as they are processed.
+    rank_batch = KEYWORD_RANKING == 'tfidf'
+    if SCRAPER_ASYNC or rank_batch:
+        webpage_contents = scrape_batch(representatives)
+    else:
+        webpage_contents = [None] * len(representatives)
+    
+    # Summaries and keywords for the whole batch in one go, with keywords
+    # ranked by TF-IDF across all scraped websites
+    if rank_batch:
+        key_contents = build_batch_key_content(webpage_contents)
+    else:
+        key_contents = [None] * len(representatives)
+    
     with ThreadPoolExecutor(max_workers=10) as executor:
-        futures = [executor.submit(process_row, row.to_dict(), generative_ai_inference_client, []) for _, row in df.iterrows()]
+        futures = {executor.submit(process_row, row, generative_ai_inference_client, [], webpage_content, key_content): group
+                   for row, webpage_content, key_content, group in zip(representatives, webpage_contents, key_contents, groups)}
         
         # Step 3: Sending to GenAI
         if progress_callback:
             progress_callback(2)
         
         for future in as_completed(futures):
+            group = futures[future]
             try:
                 result = future.result()
                 results.append(result)
-                logger.info(f"Processed row {len(results)}/{total_rows}: {result['Customer']} - {result['Primary Category']}")
+                results.extend(fan_out_result(result, rows[index]) for index in group[1:])
+                logger.info(f"Processed row {len(results)}/{total_rows}: {result['Customer']} - {result['Primary Category']}"
+                            + (f" (shared with {len(group) - 1} more rows)" if len(group) > 1 else ""))
             except Exception as exc:
                 logger.error(f"Row {len(results) + 1} generated an exception: {exc}")
     
@@ -136,6 +250,13 @@ def process_csv(input_file, output_file, generative_ai_inference_client, compart
     # Write results to output file
     results_df.to_csv(output_file, index=False)
     
+    logger.info(f"Scraper connection stats: {get_scraper_stats()}")
+    logger.info(f"HTTP cache stats: {http_cache_metrics.snapshot()}")
+    logger.info(f"DNS and dead domain stats: {dns_metrics.snapshot()}")
+    logger.info(f"Search fallback stats: {search_metrics.snapshot()}")
+    logger.info(f"LLM cache stats: {llm_cache_metrics.snapshot()}")
+    if FAST_PATH_ENABLED:
+        logger.info(f"Fast path stats (rows that skipped the AI): {fast_path_summary()}")
     logger.info(f"CSV processing completed. Output saved to: {output_file}")    
     # Step 6: Complete
     if progress_callback:
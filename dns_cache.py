@@ -0,0 +1,162 @@
+import logging
+import socket
+import ssl
+import threading
+import time
+from urllib.parse import urlparse
+from sqlite_cache import SQLiteCache
+from metrics import Counters
+from config import DNS_CACHE_TTL, DNS_NEGATIVE_TTL, DEAD_DOMAIN_CACHE_PATH, DEAD_DOMAIN_TTL, DEAD_DOMAIN_TRANSIENT_TTL
+
+logger = logging.getLogger(__name__)
+
+dns_metrics = Counters('dns')
+
+# Lookup failures that mean the name does not exist, as opposed to a resolver
+# that is temporarily unavailable (EAI_AGAIN)
+PERMANENT_DNS_ERRORS = tuple(code for code in (getattr(socket, 'EAI_NONAME', None), getattr(socket, 'EAI_NODATA', None)) if code is not None)
+
+
+class DeadDomain(Exception):
+    def __init__(self, url, reason):
+        super().__init__(f"Skipping {url}: the domain was unreachable on an earlier attempt ({reason})")
+        self.url = url
+        self.reason = reason
+
+
+# Resolver cache. urllib3 and asyncio (and so httpx) both resolve host names
+# through socket.getaddrinfo, so caching it there covers both scraper engines.
+# getaddrinfo does not expose record TTLs, so answers are kept for
+# DNS_CACHE_TTL seconds and failed lookups for DNS_NEGATIVE_TTL seconds.
+
+_original_getaddrinfo = socket.getaddrinfo
+_resolved = {}
+_resolved_lock = threading.Lock()
+
+
+def cached_getaddrinfo(host, port, family=0, type=0, proto=0, flags=0):
+    key = (host, port, family, type, proto, flags)
+    now = time.monotonic()
+    with _resolved_lock:
+        entry = _resolved.get(key)
+    if entry is not None and entry[0] > now:
+        dns_metrics.incr('hits')
+        result = entry[1]
+        if isinstance(result, socket.gaierror):
+            raise socket.gaierror(*result.args)
+        return list(result)
+
+    dns_metrics.incr('misses')
+    try:
+        result = _original_getaddrinfo(host, port, family, type, proto, flags)
+    except socket.gaierror as e:
+        with _resolved_lock:
+            _resolved[key] = (now + DNS_NEGATIVE_TTL, e)
+        raise
+    with _resolved_lock:
+        _resolved[key] = (now + DNS_CACHE_TTL, result)
+    return result
+
+
+def install_resolver_cache():
+    if DNS_CACHE_TTL > 0 and socket.getaddrinfo is not cached_getaddrinfo:
+        socket.getaddrinfo = cached_getaddrinfo
+        logger.info(f"DNS resolver cache installed (TTL {DNS_CACHE_TTL}s)")
+
+
+def clear_resolver_cache():
+    with _resolved_lock:
+        _resolved.clear()
+
+
+def connect_failure_reason(exc):
+    # Walk the chain of wrapped exceptions (requests -> urllib3 -> socket,
+    # httpx -> httpcore -> socket) for the reason a connection could not be
+    # made. Returns None for anything that does not mean the domain is dead.
+    seen = set()
+    stack = [exc]
+    while stack:
+        error = stack.pop()
+        if not isinstance(error, BaseException) or id(error) in seen:
+            continue
+        seen.add(id(error))
+        if isinstance(error, ssl.SSLError):
+            # Something answered on the other end
+            return None
+        if isinstance(error, socket.gaierror):
+            return 'dns failure' if error.errno in PERMANENT_DNS_ERRORS else None
+        if isinstance(error, ConnectionRefusedError):
+            return 'connection refused'
+        stack.extend([error.__cause__, error.__context__, getattr(error, 'reason', None)])
+        stack.extend(error.args)
+    return None
+
+
+def domain_key(url):
+    host = (urlparse(url if '://' in url else f'http://{url}').hostname or '').lower()
+    return host[4:] if host.startswith('www.') else host
+
+
+# Failures that may well be gone on the next run, unlike a name that does not exist
+TRANSIENT_REASONS = {'connect timeout', 'connection refused'}
+
+
+class DeadDomainCache:
+    # Domains that failed DNS, refused connections or timed out, shared by
+    # all rows of a run and, on disk, across runs. Entries expire so that
+    # domains coming back get another chance: after DEAD_DOMAIN_TTL seconds
+    # for DNS failures and DEAD_DOMAIN_TRANSIENT_TTL for the others.
+
+    def __init__(self, path=DEAD_DOMAIN_CACHE_PATH, ttl=DEAD_DOMAIN_TTL, transient_ttl=DEAD_DOMAIN_TRANSIENT_TTL):
+        self.transient_ttl = transient_ttl
+        self._store = SQLiteCache(path, table='dead_domains', ttl=ttl, compress=False)
+
+    def reason(self, url):
+        entry = self._store.get(domain_key(url), include_expired=True)
+        if entry is None:
+            return None
+        reason = entry.metadata.get('reason')
+        if self._store.is_expired(entry, self.transient_ttl if reason in TRANSIENT_REASONS else None):
+            return None
+        return reason
+
+    def mark(self, url, reason):
+        logger.warning(f"Marking {domain_key(url)} as unreachable ({reason})")
+        self._store.set(domain_key(url), None, {'reason': reason, 'url': url})
+
+    def forget(self, url):
+        self._store.delete(domain_key(url))
+
+    def stats(self):
+        return self._store.stats()
+
+
+_dead_domains = None
+_dead_domains_lock = threading.Lock()
+
+
+def get_dead_domains():
+    global _dead_domains
+    if _dead_domains is None:
+        with _dead_domains_lock:
+            if _dead_domains is None:
+                _dead_domains = DeadDomainCache()
+    return _dead_domains
+
+
+def dead_domain_reason(url):
+    return get_dead_domains().reason(url)
+
+
+def check_domain(url):
+    # Called by both scraper engines before going to the network
+    reason = dead_domain_reason(url)
+    if reason:
+        dns_metrics.incr('dead_domain_skips')
+        raise DeadDomain(url, reason)
+
+
+def record_connect_failure(url, reason):
+    if reason:
+        dns_metrics.incr('dead_domains_marked')
+        get_dead_domains().mark(url, reason)
@@ -0,0 +1,62 @@
+import logging
+from constants import VALID_CATEGORIES
+from vertical_index import get_vertical_index
+from metrics import Counters
+from config import FAST_PATH_MIN_SCORE, FAST_PATH_MARGIN
+
+logger = logging.getLogger(__name__)
+
+fast_path_metrics = Counters('fast_path')
+
+# VERTICAL_SUMMARIES keys that differ from the category the AI is asked to return
+CATEGORY_NAMES = {'Campus': 'Campus Stores'}
+
+
+def category_name(vertical):
+    return CATEGORY_NAMES.get(vertical, vertical)
+
+
+def describe_matches(matches):
+    return '; '.join(f"{tier}: {', '.join(keywords)}" for tier, keywords in sorted(matches.items()))
+
+
+def classify_locally(webpage_content, min_score=FAST_PATH_MIN_SCORE, margin=FAST_PATH_MARGIN):
+    # Classifies a scraped website from the VERTICAL_SUMMARIES keyword tiers
+    # alone. Returns the classification columns when one vertical clearly
+    # wins, or None to send the row to the AI: when the best score is below
+    # min_score, within margin of the runner-up, or the winner has negative
+    # keywords. Search fallback snippets are about more than one company and
+    # always go to the AI.
+    if webpage_content.get('source') != 'website':
+        fast_path_metrics.incr('escalated')
+        return None
+
+    index = get_vertical_index()
+    text = webpage_content.get('home', '') + ' ' + webpage_content.get('about', '')
+    rows = index.scan(text)
+    (vertical, score), (runner_up, runner_up_score) = index.ranked(text, rows)[:2]
+    matches = index.matches(text, rows).get(vertical, {})
+    category = category_name(vertical)
+
+    if score < min_score or score - runner_up_score < margin or 'negative' in matches or category not in VALID_CATEGORIES:
+        logger.debug(f"Fast path escalates to the AI: {vertical} {score:g} against {runner_up} {runner_up_score:g}")
+        fast_path_metrics.incr('escalated')
+        return None
+
+    fast_path_metrics.incr('classified')
+    logger.info(f"Fast path classified as {category} (score {score:g}, runner-up {runner_up} {runner_up_score:g})")
+    return {
+        'Primary Category': category,
+        'Secondary Category': category_name(runner_up) if runner_up_score > 0 else 'N/A',
+        'Confidence': 'High' if 'tier1' in matches else 'Medium',
+        'Explanation': f"Classified from the {vertical} keywords found on the website ({describe_matches(matches)}).",
+        'Confidence Justification': f"Keyword score {score:g}, {score - runner_up_score:g} ahead of the next vertical ({runner_up}: {runner_up_score:g}).",
+    }
+
+
+def fast_path_summary():
+    # Counts plus the share of rows that never reached the AI
+    counts = fast_path_metrics.snapshot()
+    total = counts.get('classified', 0) + counts.get('escalated', 0)
+    counts['skipped_fraction'] = round(counts.get('classified', 0) / total, 3) if total else 0.0
+    return counts
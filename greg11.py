@@ -1,19 +1,31 @@
-from setup_utils import setup_nltk, setup_logging
+from setup_utils import setup_logging
 from utils import setup_oci_client
 from core_logic import categorize_business, process_csv_file, guidance_prompt  # Import guidance_prompt
+from http_cache import configure_http_cache
+from llm_cache import configure_llm_cache
+import argparse
 import os
 import uuid
 import sys
 
-# Setup NLTK
-setup_nltk()
-
 # Initialize logger
 logger = setup_logging()
 
 # Global flag to prevent multiple executions
 EXECUTION_FLAG = False
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="OCI AI-powered Business Categorizer")
+    parser.add_argument('--http-cache', action='store_true',
+                        help="Cache fetched web pages on disk and revalidate them on later runs")
+    parser.add_argument('--offline', action='store_true',
+                        help="Never touch the network for web pages, serve everything from the HTTP cache")
+    parser.add_argument('--llm-cache-only', action='store_true',
+                        help="Dry run: answer only from the LLM response cache and never call the AI service")
+    parser.add_argument('--no-llm-cache', action='store_true',
+                        help="Always call the AI service, without reading or storing cached responses")
+    return parser.parse_args()
+
 def main():
     global EXECUTION_FLAG
     if EXECUTION_FLAG:
@@ -21,6 +33,12 @@ def main():
         return
     EXECUTION_FLAG = True
 
+    args = parse_args()
+    if args.http_cache or args.offline:
+        configure_http_cache(enabled=True, offline=args.offline)
+    if args.llm_cache_only or args.no_llm_cache:
+        configure_llm_cache(enabled=not args.no_llm_cache, cache_only=args.llm_cache_only)
+
     try:
         logger.info("OCI AI-powered Business Categorizer")
         logger.info("1. Interactive chat")
@@ -0,0 +1,127 @@
+import logging
+import re
+from config import HTML_PARSER_BACKEND
+
+logger = logging.getLogger(__name__)
+
+# Fastest first; 'auto' picks the first one that is installed
+BACKEND_PREFERENCE = ['selectolax', 'lxml', 'html.parser']
+
+
+class SelectolaxPage:
+    def __init__(self, html):
+        from selectolax.lexbor import LexborHTMLParser
+        self._tree = LexborHTMLParser(html)
+
+    def links(self):
+        return [(node.attributes.get('href') or '', node.text(deep=True)) for node in self._tree.css('a[href]')]
+
+    def text(self):
+        self._tree.strip_tags(['script', 'style'])
+        root = self._tree.root
+        return root.text(separator='\n', strip=True) if root is not None else ''
+
+
+class LxmlPage:
+    _text_nodes = None
+
+    def __init__(self, html):
+        import lxml.html
+        from lxml import etree
+        # Always hand lxml UTF-8 bytes with an explicit encoding; it refuses
+        # str input that carries an XML encoding declaration
+        if isinstance(html, bytes):
+            html = html.decode('utf-8', errors='replace')
+        parser = lxml.html.HTMLParser(encoding='utf-8')
+        try:
+            self._root = lxml.html.document_fromstring(html.encode('utf-8'), parser=parser)
+        except (etree.ParserError, ValueError):
+            # Empty or unparseable document
+            self._root = None
+        if LxmlPage._text_nodes is None:
+            LxmlPage._text_nodes = etree.XPath('//text()[not(ancestor::script) and not(ancestor::style)]')
+
+    def links(self):
+        if self._root is None:
+            return []
+        return [(link.get('href'), link.text_content()) for link in self._root.iter('a') if link.get('href') is not None]
+
+    def text(self):
+        if self._root is None:
+            return ''
+        return '\n'.join(text.strip() for text in LxmlPage._text_nodes(self._root) if text.strip())
+
+
+class SoupPage:
+    def __init__(self, html):
+        from bs4 import BeautifulSoup
+        self._soup = BeautifulSoup(html, 'html.parser')
+
+    def links(self):
+        return [(link['href'], link.text) for link in self._soup.find_all('a', href=True)]
+
+    def text(self):
+        # Remove script and style elements
+        for element in self._soup(['script', 'style']):
+            element.decompose()
+        return self._soup.get_text(separator='\n', strip=True)
+
+
+BACKENDS = {
+    'selectolax': SelectolaxPage,
+    'lxml': LxmlPage,
+    'html.parser': SoupPage,
+}
+
+_BACKEND_MODULES = {
+    'selectolax': 'selectolax.lexbor',
+    'lxml': 'lxml.html',
+    'html.parser': 'bs4',
+}
+
+
+def is_available(backend):
+    try:
+        __import__(_BACKEND_MODULES[backend])
+        return True
+    except ImportError:
+        return False
+
+
+def available_backends():
+    return [backend for backend in BACKEND_PREFERENCE if is_available(backend)]
+
+
+def resolve_backend(backend=None):
+    backend = backend or HTML_PARSER_BACKEND
+    if backend != 'auto':
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown HTML parser backend '{backend}'. Choose one of: auto, {', '.join(BACKEND_PREFERENCE)}")
+        if is_available(backend):
+            return backend
+        logger.warning(f"HTML parser backend '{backend}' is not installed, falling back to the fastest available one")
+    available = available_backends()
+    if not available:
+        raise ImportError("No HTML parser backend is installed (selectolax, lxml or beautifulsoup4)")
+    return available[0]
+
+
+_default_backend = None
+
+
+def parse_html(html, backend=None):
+    # Returns a parsed page with links() -> [(href, text)] and text().
+    # text() strips script and style elements, so call links() first when
+    # both are needed from the same page.
+    global _default_backend
+    if backend is None:
+        if _default_backend is None:
+            _default_backend = resolve_backend()
+            logger.info(f"Using HTML parser backend: {_default_backend}")
+        backend = _default_backend
+    return BACKENDS[backend](html)
+
+
+def clean_text(text):
+    # Remove extra whitespace
+    return re.sub(r'\s+', ' ', text).strip()
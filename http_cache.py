@@ -0,0 +1,142 @@
+import logging
+import threading
+from collections import namedtuple
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from sqlite_cache import SQLiteCache
+from metrics import Counters
+from config import HTTP_CACHE_ENABLED, HTTP_CACHE_PATH, HTTP_CACHE_TTL, HTTP_CACHE_MAX_BYTES, SCRAPER_OFFLINE
+
+logger = logging.getLogger(__name__)
+
+# A fetched page, independent of the HTTP client that produced it.
+# headers is a dict with lower-cased names.
+FetchedPage = namedtuple('FetchedPage', ['url', 'status_code', 'headers', 'content', 'from_cache'])
+
+# Response headers worth keeping alongside a cached body
+CACHED_HEADERS = ('content-type', 'content-encoding', 'etag', 'last-modified')
+
+http_cache_metrics = Counters('http_cache')
+
+
+class OfflineCacheMiss(Exception):
+    def __init__(self, url):
+        super().__init__(f"{url} is not in the HTTP cache and the scraper is running offline")
+        self.url = url
+
+
+def cache_key(url):
+    # Normalize the URL so that trivially different spellings share an entry
+    parts = urlsplit(url.strip())
+    scheme = (parts.scheme or 'https').lower()
+    netloc = parts.netloc.lower()
+    if netloc.startswith('www.'):
+        netloc = netloc[4:]
+    if (scheme == 'http' and netloc.endswith(':80')) or (scheme == 'https' and netloc.endswith(':443')):
+        netloc = netloc.rsplit(':', 1)[0]
+    path = parts.path.rstrip('/') or '/'
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, netloc, path, query, ''))
+
+
+def page_headers(headers):
+    return {name.lower(): value for name, value in headers.items()}
+
+
+class HttpCache:
+    def __init__(self, path=HTTP_CACHE_PATH, ttl=HTTP_CACHE_TTL, max_bytes=HTTP_CACHE_MAX_BYTES):
+        self._store = SQLiteCache(path, table='http_responses', ttl=ttl, max_bytes=max_bytes)
+
+    def lookup(self, url):
+        # Returns (page, is_fresh), or (None, False) when nothing is cached
+        entry = self._store.get(cache_key(url), include_expired=True)
+        if entry is None:
+            return None, False
+        metadata = entry.metadata
+        page = FetchedPage(metadata.get('url', url), metadata.get('status_code', 200), metadata.get('headers', {}), entry.value, True)
+        return page, not self._store.is_expired(entry)
+
+    def conditional_headers(self, page):
+        headers = {}
+        if page is None:
+            return headers
+        if page.headers.get('etag'):
+            headers['If-None-Match'] = page.headers['etag']
+        if page.headers.get('last-modified'):
+            headers['If-Modified-Since'] = page.headers['last-modified']
+        return headers
+
+    def store(self, url, page):
+        headers = {name: page.headers[name] for name in CACHED_HEADERS if name in page.headers}
+        self._store.set(cache_key(url), page.content, {'url': page.url, 'status_code': page.status_code, 'headers': headers})
+
+    def revalidated(self, url):
+        self._store.touch(cache_key(url))
+
+    def stats(self):
+        return self._store.stats()
+
+
+_settings = {'enabled': HTTP_CACHE_ENABLED or SCRAPER_OFFLINE, 'offline': SCRAPER_OFFLINE, 'path': HTTP_CACHE_PATH}
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def configure_http_cache(enabled=None, offline=None, path=None):
+    # Used by the CLI to switch the cache (or fully offline mode) on at startup
+    global _cache
+    with _cache_lock:
+        if enabled is not None:
+            _settings['enabled'] = enabled
+        if offline is not None:
+            _settings['offline'] = offline
+            if offline:
+                _settings['enabled'] = True
+        if path is not None:
+            _settings['path'] = path
+        _cache = None
+    logger.info(f"HTTP cache settings: {_settings}")
+
+
+def is_offline():
+    return _settings['offline']
+
+
+def get_http_cache():
+    global _cache
+    if not _settings['enabled']:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = HttpCache(path=_settings['path'])
+    return _cache
+
+
+def lookup_for_fetch(url):
+    # Called by both scraper engines before going to the network. Returns
+    # (page, stale_page, extra_headers): page is a fresh cache hit to use
+    # as-is, stale_page is an expired entry to revalidate with extra_headers.
+    cache = get_http_cache()
+    if cache is None:
+        return None, None, {}
+    page, is_fresh = cache.lookup(url)
+    if page is not None and (is_fresh or is_offline()):
+        http_cache_metrics.incr('hits')
+        return page, None, {}
+    http_cache_metrics.incr('misses')
+    if is_offline():
+        raise OfflineCacheMiss(url)
+    return None, page, cache.conditional_headers(page)
+
+
+def record_revalidated(url, stale_page):
+    http_cache_metrics.incr('revalidated')
+    get_http_cache().revalidated(url)
+    return stale_page
+
+
+def record_fetched(url, page):
+    cache = get_http_cache()
+    if cache is not None and page.status_code == 200:
+        cache.store(url, page)
+    return page
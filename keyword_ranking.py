@@ -0,0 +1,67 @@
+from itertools import chain, count
+import numpy as np
+
+# TF-IDF keyword ranking across a whole batch of documents at once. Plain
+# frequency ranks site-wide boilerplate ("contact", "cookies", "privacy")
+# first; weighting by inverse document frequency pushes words that appear on
+# every site in the batch down.
+
+
+class TermDocumentMatrix:
+    # Sparse documents x terms count matrix in CSR layout: the counts of
+    # document i are data[indptr[i]:indptr[i + 1]], for the terms at the same
+    # positions in indices.
+
+    def __init__(self, terms, indptr, indices, data):
+        self.terms = terms
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+
+    @classmethod
+    def from_counts(cls, documents):
+        # documents is a list of {term: count} mappings, e.g. Counters. Built
+        # with C-level iterators rather than a Python loop over every entry.
+        terms = list(chain.from_iterable(documents))
+        vocabulary = dict(zip(dict.fromkeys(terms), count()))
+        indptr = np.zeros(len(documents) + 1, dtype=np.int64)
+        np.cumsum([len(counts) for counts in documents], out=indptr[1:])
+        return cls(
+            np.array(list(vocabulary), dtype=object),
+            indptr,
+            np.fromiter(map(vocabulary.__getitem__, terms), dtype=np.int64, count=len(terms)),
+            np.fromiter(chain.from_iterable(counts.values() for counts in documents), dtype=np.float64, count=len(terms)),
+        )
+
+    @property
+    def num_documents(self):
+        return len(self.indptr) - 1
+
+    def row_ids(self):
+        return np.repeat(np.arange(self.num_documents), np.diff(self.indptr))
+
+    def tfidf(self):
+        # Smoothed idf as in scikit-learn, so a batch of one document ranks
+        # by plain frequency
+        document_frequency = np.bincount(self.indices, minlength=len(self.terms))
+        idf = np.log((1 + self.num_documents) / (1 + document_frequency)) + 1
+        return self.data * idf[self.indices]
+
+    def top_terms(self, scores, k):
+        # The k best scoring terms of every document, without a Python loop
+        # over the entries: sort by document, then score (ties by first
+        # appearance in the batch), and keep the first k of each document
+        if not len(scores):
+            return [[] for _ in range(self.num_documents)]
+        row_ids = self.row_ids()
+        order = np.lexsort((self.indices, -scores, row_ids))
+        rank = np.arange(len(order)) - self.indptr[row_ids[order]]
+        selected = self.terms[self.indices[order[rank < k]]]
+        per_document = np.minimum(np.diff(self.indptr), k)
+        return [terms.tolist() for terms in np.split(selected, np.cumsum(per_document)[:-1])]
+
+
+def batch_top_keywords(documents, num_keywords=10):
+    # Top TF-IDF keywords for each of a list of {term: count} documents
+    matrix = TermDocumentMatrix.from_counts(documents)
+    return matrix.top_terms(matrix.tfidf(), num_keywords)
@@ -0,0 +1,134 @@
+import logging
+import re
+from config import (
+    LINK_ABOUT_KEYWORDS,
+    LINK_PRODUCT_KEYWORDS,
+    LINK_AVOID_KEYWORDS,
+    LINK_TEXT_WEIGHT,
+    LINK_HREF_WEIGHT,
+    LINK_SHORT_URL_BONUS,
+    LINK_AVOID_PENALTY,
+)
+
+logger = logging.getLogger(__name__)
+
+# Never part of a keyword: SEPARATOR splits the links of a page, JOINER the
+# keywords found in one link
+SEPARATOR = '\x00'
+JOINER = '\x01'
+
+# Cap on the number of distinct keyword combinations remembered per scorer
+MAX_MEMO_SIZE = 10000
+
+
+def trie_pattern(words):
+    # Regex for a set of words, shaped like a trie ("about(?: us)?") so the
+    # engine never backtracks over shared prefixes. Branches below a node
+    # start with different characters and optional tails are greedy, so at
+    # any position it matches the longest word that starts there.
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = True
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        return f'(?:{body})?' if '' in node else body
+
+    return build(trie)
+
+
+class LinkScorer:
+    # Same scores as webscraper.score_link, computed in one regex pass over
+    # all links of a page instead of one substring test per keyword and link.
+    # A lookahead finds the longest keyword starting at each position; every
+    # keyword that is a prefix of it starts there too, so together they give
+    # exactly the set of keywords contained in each string. Links repeat the
+    # same few keyword combinations, so their points are memoized.
+
+    def __init__(self, about_keywords=LINK_ABOUT_KEYWORDS, product_keywords=LINK_PRODUCT_KEYWORDS, avoid_keywords=LINK_AVOID_KEYWORDS,
+                 text_weight=LINK_TEXT_WEIGHT, href_weight=LINK_HREF_WEIGHT, short_url_bonus=LINK_SHORT_URL_BONUS, avoid_penalty=LINK_AVOID_PENALTY):
+        self.short_url_bonus = short_url_bonus
+        self.avoid_penalty = avoid_penalty
+        self.avoid_keywords = frozenset(keyword.lower() for keyword in avoid_keywords)
+
+        # A keyword listed twice (or in both lists) counts twice, like in score_link
+        self.text_points = {}
+        self.href_points = {}
+        for keyword in list(about_keywords) + list(product_keywords):
+            keyword = keyword.lower()
+            self.text_points[keyword] = self.text_points.get(keyword, 0) + text_weight
+            self.href_points[keyword] = self.href_points.get(keyword, 0) + href_weight
+
+        keywords = set(self.text_points) | self.avoid_keywords
+        self._prefixes = {keyword: [other for other in keywords if keyword.startswith(other)] for keyword in keywords}
+        # The separator is matched too, so one findall over a whole page
+        # comes back already split per link. The leading character class
+        # lets the engine skip positions where nothing can start cheaply.
+        alternatives = [trie_pattern(keywords)] if keywords else []
+        first_chars = ''.join(sorted({keyword[0] for keyword in keywords} | {SEPARATOR}))
+        self._pattern = re.compile(f'(?=[{re.escape(first_chars)}])(?=(' + '|'.join(alternatives + [re.escape(SEPARATOR)]) + '))')
+        self._text_memo = {}
+        self._href_memo = {}
+
+    def _found(self, strings):
+        # One JOINER-joined string of the longest keyword matches per input string
+        matches = self._pattern.findall(SEPARATOR.join(strings))
+        return JOINER.join(matches).split(SEPARATOR)
+
+    def _keywords(self, found):
+        keywords = set()
+        for match in found.split(JOINER):
+            if match:
+                keywords.update(self._prefixes[match])
+        return keywords
+
+    def _text_score(self, found):
+        points = self._text_memo.get(found)
+        if points is None:
+            points = sum(self.text_points.get(keyword, 0) for keyword in self._keywords(found))
+            if len(self._text_memo) >= MAX_MEMO_SIZE:
+                self._text_memo.clear()
+            self._text_memo[found] = points
+        return points
+
+    def _href_score(self, found):
+        points = self._href_memo.get(found)
+        if points is None:
+            keywords = self._keywords(found)
+            points = sum(self.href_points.get(keyword, 0) for keyword in keywords)
+            if not keywords.isdisjoint(self.avoid_keywords):
+                points -= self.avoid_penalty
+            if len(self._href_memo) >= MAX_MEMO_SIZE:
+                self._href_memo.clear()
+            self._href_memo[found] = points
+        return points
+
+    def score_links(self, links):
+        # links is a list of (href, text) pairs; returns one score per link
+        if not links:
+            return []
+        found = self._found([href.lower() for href, _ in links] + [text.lower() for _, text in links])
+        text_score, href_score, short_url_bonus = self._text_score, self._href_score, self.short_url_bonus
+        return [
+            text_score(in_text) + href_score(in_href) + (short_url_bonus if href.count('/') <= 1 else 0)
+            for (href, _), in_href, in_text in zip(links, found, found[len(links):])
+        ]
+
+    def score(self, link_text, link_href):
+        return self.score_links([(link_href, link_text)])[0]
+
+
+_scorer = None
+
+
+def get_link_scorer():
+    global _scorer
+    if _scorer is None:
+        _scorer = LinkScorer()
+    return _scorer
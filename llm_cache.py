@@ -0,0 +1,97 @@
+import hashlib
+import json
+import logging
+import threading
+from sqlite_cache import SQLiteCache
+from metrics import Counters
+from config import LLM_CACHE_ENABLED, LLM_CACHE_ONLY, LLM_CACHE_PATH, LLM_CACHE_TTL, LLM_CACHE_MAX_BYTES
+
+logger = logging.getLogger(__name__)
+
+llm_cache_metrics = Counters('llm_cache')
+
+# Everything in a chat request that can change the answer. is_stream is left
+# out: streamed and non-streamed requests get the same text.
+FINGERPRINT_FIELDS = ['message', 'preamble_override', 'chat_history', 'max_tokens', 'temperature', 'frequency_penalty', 'top_p', 'top_k']
+
+
+def request_fingerprint(chat_detail):
+    # sha256 of the model and the request fields. Chat history entries are
+    # OCI model objects, which are serialized through their JSON repr.
+    chat_request = chat_detail.chat_request
+    fields = {name: getattr(chat_request, name, None) for name in FINGERPRINT_FIELDS}
+    fields['model'] = getattr(chat_detail.serving_mode, 'model_id', None)
+    payload = json.dumps(fields, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class LLMCache:
+    # Full response texts of earlier chat requests, keyed by request_fingerprint.
+    # With TEMPERATURE at 0 a re-run of the same CSV sends byte-identical
+    # requests, which are answered from here without calling the service.
+
+    def __init__(self, path=LLM_CACHE_PATH, ttl=LLM_CACHE_TTL, max_bytes=LLM_CACHE_MAX_BYTES):
+        self._store = SQLiteCache(path, table='llm_responses', ttl=ttl, max_bytes=max_bytes)
+
+    def get(self, key):
+        entry = self._store.get(key)
+        return entry.value.decode('utf-8') if entry is not None else None
+
+    def set(self, key, text, metadata=None):
+        self._store.set(key, text.encode('utf-8'), metadata)
+
+    def stats(self):
+        return self._store.stats()
+
+
+_settings = {'enabled': LLM_CACHE_ENABLED or LLM_CACHE_ONLY, 'cache_only': LLM_CACHE_ONLY, 'path': LLM_CACHE_PATH}
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def configure_llm_cache(enabled=None, cache_only=None, path=None):
+    # Used by the CLI, e.g. for a cache-only dry run that never calls the service
+    global _cache
+    with _cache_lock:
+        if enabled is not None:
+            _settings['enabled'] = enabled
+        if cache_only is not None:
+            _settings['cache_only'] = cache_only
+            if cache_only:
+                _settings['enabled'] = True
+        if path is not None:
+            _settings['path'] = path
+        _cache = None
+    logger.info(f"LLM cache settings: {_settings}")
+
+
+def is_cache_only():
+    return _settings['cache_only']
+
+
+def get_llm_cache():
+    global _cache
+    if not _settings['enabled']:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = LLMCache(path=_settings['path'])
+    return _cache
+
+
+def lookup_response(key):
+    # The cached response text for a request fingerprint, or None
+    cache = get_llm_cache()
+    if cache is None:
+        return None
+    text = cache.get(key)
+    llm_cache_metrics.incr('hits' if text is not None else 'misses')
+    return text
+
+
+def store_response(key, text, metadata=None):
+    cache = get_llm_cache()
+    if cache is not None and text.strip():
+        cache.set(key, text, metadata)
+        llm_cache_metrics.incr('stored')
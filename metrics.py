@@ -0,0 +1,27 @@
+import threading
+from collections import Counter
+
+
+class Counters:
+    # Thread-safe named counters, shared by the worker threads of a batch
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._counts = Counter()
+
+    def incr(self, key, amount=1):
+        with self._lock:
+            self._counts[key] += amount
+
+    def get(self, key):
+        with self._lock:
+            return self._counts[key]
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._counts)
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
@@ -0,0 +1,127 @@
+import argparse
+import logging
+import os
+import threading
+import time
+from http_cache import is_offline
+from config import NLTK_DATA_DIR, NLTK_DOWNLOAD
+
+logger = logging.getLogger(__name__)
+
+# Where nltk.data.find looks for each resource, inside any NLTK data directory
+RESOURCE_PATHS = {
+    'punkt': 'tokenizers/punkt',
+    'punkt_tab': 'tokenizers/punkt_tab',
+    'stopwords': 'corpora/stopwords',
+}
+
+_nltk = None
+_ready = {}
+# Reentrant: ensure_resource and warm_up import NLTK while holding it
+_lock = threading.RLock()
+_warmed_up = False
+
+
+def data_dir():
+    return os.path.expanduser(NLTK_DATA_DIR)
+
+
+def load_nltk():
+    # NLTK takes a quarter of a second to import, so it is imported on first
+    # use rather than at startup. NLTK_DATA_DIR goes first on its data path,
+    # so a pre-baked bundle wins over anything else installed on the machine.
+    global _nltk
+    if _nltk is None:
+        with _lock:
+            if _nltk is None:
+                import nltk
+                path = data_dir()
+                if path not in nltk.data.path:
+                    nltk.data.path.insert(0, path)
+                _nltk = nltk
+    return _nltk
+
+
+def sentence_tokenizer():
+    # NLTK 3.8.2 moved the sentence splitter's data from punkt to punkt_tab
+    return 'punkt_tab' if hasattr(load_nltk().tokenize, 'PunktTokenizer') else 'punkt'
+
+
+def required_resources():
+    return [sentence_tokenizer(), 'stopwords']
+
+
+def is_installed(name):
+    try:
+        load_nltk().data.find(RESOURCE_PATHS.get(name, name))
+        return True
+    except LookupError:
+        return False
+
+
+def download_resource(name, download_dir=None):
+    if not NLTK_DOWNLOAD or is_offline():
+        logger.warning(f"NLTK resource {name} is not installed and downloads are disabled. Point NLTK_DATA_DIR at a directory that has it.")
+        return False
+    download_dir = download_dir or data_dir()
+    os.makedirs(download_dir, exist_ok=True)
+    logger.info(f"Downloading NLTK resource {name} to {download_dir}")
+    try:
+        load_nltk().download(name, download_dir=download_dir, quiet=True, raise_on_error=True)
+    except Exception as e:
+        logger.error(f"Failed to download NLTK resource {name}: {str(e)}")
+        return False
+    return is_installed(name)
+
+
+def ensure_resource(name):
+    # True once the resource is available. Looks on disk first and only goes
+    # to the network when it is missing; the outcome is remembered, so every
+    # later call is a dict lookup.
+    ready = _ready.get(name)
+    if ready is not None:
+        return ready
+    with _lock:
+        if name not in _ready:
+            _ready[name] = is_installed(name) or download_resource(name)
+        return _ready[name]
+
+
+def warm_up():
+    # Loads the stop words and the sentence splitter once, before worker
+    # threads race to load them. NLTK's lazy corpus loaders are not safe to
+    # load from several threads at the same time.
+    global _warmed_up
+    if _warmed_up:
+        return
+    with _lock:
+        if _warmed_up:
+            return
+        start = time.perf_counter()
+        nltk = load_nltk()
+        for name in required_resources():
+            ensure_resource(name)
+        if _ready['stopwords']:
+            nltk.corpus.stopwords.words('english')
+        if _ready[sentence_tokenizer()]:
+            nltk.tokenize.sent_tokenize('Warm up.')
+        _warmed_up = True
+        logger.info(f"NLTK resources loaded in {time.perf_counter() - start:.3f}s: {dict(_ready)}")
+
+
+def main():
+    # Pre-bakes the resources into a directory to ship with the app, e.g.
+    #     python nltk_resources.py --dir vendor/nltk_data
+    # and then run with NLTK_DATA_DIR=vendor/nltk_data NLTK_DOWNLOAD=false
+    parser = argparse.ArgumentParser(description="Download the NLTK resources the categorizer needs")
+    parser.add_argument('--dir', default=data_dir(), help="Target directory (default: NLTK_DATA_DIR)")
+    args = parser.parse_args()
+    resources = required_resources()
+    for name in resources:
+        if not load_nltk().download(name, download_dir=args.dir):
+            raise SystemExit(f"Failed to download NLTK resource {name}")
+    print(f"NLTK resources saved to {args.dir}: {', '.join(resources)}")
+
+
+if __name__ == '__main__':
+    main()
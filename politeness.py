@@ -0,0 +1,93 @@
+import logging
+import socket
+import threading
+import time
+from urllib.parse import urlparse
+from config import SCRAPER_HOST_RATE, SCRAPER_HOST_BURST, SCRAPER_HOST_MAX_PENALTY, SCRAPER_RATE_LIMIT_BY_IP
+
+logger = logging.getLogger(__name__)
+
+
+class _Bucket:
+    __slots__ = ('next_free', 'blocked_until', 'penalty')
+
+    def __init__(self):
+        self.next_free = 0.0
+        self.blocked_until = 0.0
+        self.penalty = 1.0
+
+
+class HostRateLimiter:
+    # Token bucket per host (or per resolved IP, so that many customers on the
+    # same shared hosting share one budget). reserve() never blocks: it books
+    # the next free slot for the key and returns how long the caller has to
+    # wait, so the sync scraper can time.sleep() and the async scraper can
+    # asyncio.sleep() without holding anything up for other hosts.
+    # A 429/503 halves the host's rate (up to max_penalty) and blocks it for
+    # Retry-After seconds; successful responses slowly earn the rate back.
+
+    def __init__(self, rate=SCRAPER_HOST_RATE, burst=SCRAPER_HOST_BURST, max_penalty=SCRAPER_HOST_MAX_PENALTY, by_ip=SCRAPER_RATE_LIMIT_BY_IP):
+        self.rate = rate
+        self.burst = burst
+        self.max_penalty = max_penalty
+        self.by_ip = by_ip
+        self._buckets = {}
+        self._addresses = {}
+        self._lock = threading.Lock()
+
+    def key_for(self, url):
+        host = (urlparse(url).hostname or '').lower()
+        if not self.by_ip or not host:
+            return host
+        if host not in self._addresses:
+            try:
+                self._addresses[host] = socket.gethostbyname(host)
+            except OSError:
+                # Unresolvable hosts fail fast anyway, so just pace them by name
+                self._addresses[host] = host
+        return self._addresses[host]
+
+    def _bucket(self, key):
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = _Bucket()
+        return bucket
+
+    def reserve(self, key):
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            bucket = self._bucket(key)
+            now = time.monotonic()
+            interval = bucket.penalty / self.rate
+            # Up to `burst` requests may go out back to back
+            start = max(bucket.next_free, now - (self.burst - 1) * interval, bucket.blocked_until)
+            bucket.next_free = start + interval
+            return max(start - now, 0.0)
+
+    def penalize(self, key, retry_after=None):
+        with self._lock:
+            bucket = self._bucket(key)
+            bucket.penalty = min(bucket.penalty * 2, self.max_penalty)
+            delay = retry_after if retry_after is not None else bucket.penalty / self.rate if self.rate > 0 else 0
+            bucket.blocked_until = max(bucket.blocked_until, time.monotonic() + delay)
+            logger.info(f"Throttled by {key}: backing off {delay:.1f}s, rate now 1 request per {bucket.penalty / self.rate if self.rate > 0 else 0:.1f}s")
+
+    def reward(self, key):
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is not None and bucket.penalty > 1:
+                bucket.penalty = max(bucket.penalty * 0.9, 1.0)
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = HostRateLimiter()
+    return _limiter
@@ -0,0 +1,115 @@
+import logging
+import re
+from collections import namedtuple
+from constants import VALID_CATEGORIES
+
+logger = logging.getLogger(__name__)
+
+# A field of the AI response, reported as soon as its line is complete
+FieldUpdate = namedtuple('FieldUpdate', ['field', 'value'])
+
+CONFIDENCE_LEVELS = ["High", "Medium", "Low", "N/A"]
+
+
+def validate_category(category, category_type):
+    if category not in VALID_CATEGORIES:
+        logger.warning(f"Invalid {category_type} category '{category}' returned by AI. Defaulting to 'NEEDS FURTHER REVIEW'.")
+        return "NEEDS FURTHER REVIEW" if category_type == "primary" else "N/A"
+    return category
+
+
+def validate_confidence(confidence):
+    if confidence not in CONFIDENCE_LEVELS:
+        logger.warning(f"Invalid confidence level '{confidence}' returned by AI. Defaulting to 'N/A'.")
+        return "N/A"
+    return confidence
+
+
+# (label in the response, result column, validator), in the order of the
+# result dict. Each value is the rest of the line after the first
+# occurrence of the label, as the prompt's Output Format asks.
+RESPONSE_FIELDS = [
+    ('PRIMARY_CATEGORY', 'Primary Category', lambda value: validate_category(value, "primary")),
+    ('SECONDARY_CATEGORY', 'Secondary Category', lambda value: validate_category(value, "secondary")),
+    ('CONFIDENCE', 'Confidence', validate_confidence),
+    ('EXPLANATION', 'Explanation', None),
+    ('CONFIDENCE_JUSTIFICATION', 'Confidence Justification', None),
+]
+
+FIELD_PATTERNS = {label: re.compile(rf'{label}:\s*(.*?)(?=\n|$)', re.DOTALL | re.IGNORECASE) for label, _, _ in RESPONSE_FIELDS}
+
+
+class ResponseFieldParser:
+    # Parses the AI response as it streams in. feed() takes each chunk and
+    # returns a FieldUpdate for every field whose line it completed, so the
+    # caller can act on PRIMARY_CATEGORY long before REASONING is written.
+    # Values are the same as a regex search over the whole text would give.
+    # A field is only searched for again when a newline arrives, starting
+    # where the last search left off, so the text is scanned about once.
+    # With required_fields (labels such as 'CONFIDENCE'), complete turns
+    # True once all of them are captured and the rest can be skipped.
+
+    def __init__(self, required_fields=()):
+        # Raising here would surface mid-stream in get_ai_response, after its
+        # error handler has returned, so a bad STREAM_REQUIRED_FIELDS entry
+        # is only logged
+        unknown = set(required_fields) - set(FIELD_PATTERNS)
+        if unknown:
+            logger.warning(f"Ignoring unknown response fields in STREAM_REQUIRED_FIELDS: {', '.join(sorted(unknown))}")
+        self.required_fields = set(required_fields) - unknown
+        self.text = ''
+        # Chunks since the last newline, joined onto text when one arrives
+        self._pending = []
+        self.values = {}
+        self._starts = {label: 0 for label in FIELD_PATTERNS}
+
+    @property
+    def complete(self):
+        return bool(self.required_fields) and self.required_fields.issubset(self.values)
+
+    def feed(self, chunk):
+        self._pending.append(chunk)
+        # A value only ends at a newline, so no field can be completed without one
+        if '\n' not in chunk:
+            return []
+        return self._capture(final=False)
+
+    def close(self, truncated=False):
+        # End of the response: values running up to the end of the text are
+        # complete too, unless the response was cut off there
+        return self._capture(final=not truncated)
+
+    def _capture(self, final):
+        self.text += ''.join(self._pending)
+        self._pending = []
+        updates = []
+        for label, column, validator in RESPONSE_FIELDS:
+            if label in self.values:
+                continue
+            match = FIELD_PATTERNS[label].search(self.text, self._starts[label])
+            if match is None:
+                # The label may still be arriving at the end of the text
+                self._starts[label] = max(0, len(self.text) - len(label))
+            elif match.end() < len(self.text) or final:
+                value = match.group(1).strip()
+                self.values[label] = validator(value) if validator else value
+                updates.append(FieldUpdate(column, self.values[label]))
+            else:
+                self._starts[label] = match.start()
+        return updates
+
+    def result(self):
+        # The classification columns; fields the response did not have are 'N/A'
+        # (after validation, so a missing primary category needs review)
+        return {
+            column: self.values[label] if label in self.values else (validator('N/A') if validator else 'N/A')
+            for label, column, validator in RESPONSE_FIELDS
+        }
+
+
+def parse_response(response):
+    # Fields of a complete response in one pass
+    parser = ResponseFieldParser()
+    parser.feed(response)
+    parser.close()
+    return parser.result()
@@ -0,0 +1,199 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+import requests
+from bs4 import BeautifulSoup
+from sqlite_cache import SQLiteCache
+from metrics import Counters
+from http_cache import is_offline
+from config import SEARCH_BACKEND, SEARCH_LOCAL_PATH, SEARCH_TIMEOUT, SEARCH_MAX_CONCURRENCY
+from config import SEARCH_CACHE_ENABLED, SEARCH_CACHE_PATH, SEARCH_CACHE_TTL
+
+logger = logging.getLogger(__name__)
+
+SearchResult = namedtuple('SearchResult', ['title', 'snippet'])
+
+search_metrics = Counters('search')
+
+
+def normalize_query(query):
+    return ' '.join(query.lower().split())
+
+
+def format_results(results):
+    # The text handed to the AI in place of scraped page content
+    return ' '.join(f"{result.title}\n{result.snippet}\n\n" for result in results)
+
+
+class SearchBackend:
+    # search() returns a list of SearchResult, empty when nothing was found
+    # or the search failed
+    name = None
+
+    def search(self, query, num_results=5):
+        raise NotImplementedError
+
+
+class DuckDuckGoBackend(SearchBackend):
+    name = 'duckduckgo'
+    url = 'https://html.duckduckgo.com/html/'
+    headers = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+    }
+
+    def __init__(self, timeout=SEARCH_TIMEOUT, max_concurrency=SEARCH_MAX_CONCURRENCY, session=None):
+        # session is webscraper.get_search_session: pooled and counted like the
+        # scraper's, but without retries, so SEARCH_TIMEOUT bounds the request
+        self.timeout = timeout
+        self._session = session or requests.Session()
+        # Fallback rows tend to come in bursts; don't hit DuckDuckGo with all of them at once
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+
+    def search(self, query, num_results=5):
+        if is_offline():
+            logger.info(f"Skipping DuckDuckGo search for '{query}' while running offline")
+            return []
+        # Never wait longer for a free slot than a search itself may take
+        start = time.perf_counter()
+        acquired = self._slots.acquire(timeout=self.timeout)
+        search_metrics.incr('slot_wait_seconds', time.perf_counter() - start)
+        if not acquired:
+            logger.warning(f"No DuckDuckGo search slot free within {self.timeout}s, skipping the search for '{query}'")
+            search_metrics.incr('slot_timeouts')
+            return []
+        try:
+            response = self._session.get(self.url, params={'q': query}, headers=self.headers, timeout=self.timeout)
+            response.raise_for_status()
+        except requests.exceptions.Timeout:
+            logger.error(f"DuckDuckGo search for '{query}' timed out after {self.timeout}s")
+            search_metrics.incr('timeouts')
+            return []
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Error in DuckDuckGo search: {str(e)}")
+            search_metrics.incr('errors')
+            return []
+        finally:
+            self._slots.release()
+
+        soup = BeautifulSoup(response.content, 'html.parser')
+        results = []
+        for result in soup.find_all('div', class_='result__body'):
+            title = result.find('a', class_='result__a')
+            snippet = result.find('a', class_='result__snippet')
+            if title is None or snippet is None:
+                continue
+            results.append(SearchResult(title.text, snippet.text))
+            if len(results) == num_results:
+                break
+        return results
+
+
+class LocalSearchBackend(SearchBackend):
+    # Stand-in for offline tests and benchmarks. Reads canned results from
+    # either a JSON file, {"<query>": [{"title": ..., "snippet": ...}, ...]},
+    # or a SQLite database with a search_results (query, title, snippet, rank)
+    # table. Queries are matched case-insensitively.
+    name = 'local'
+
+    def __init__(self, path=SEARCH_LOCAL_PATH):
+        if not path or not os.path.exists(path):
+            raise FileNotFoundError(f"Local search results not found: {path!r} (set SEARCH_LOCAL_PATH)")
+        self.path = path
+        self._results = None
+        self._conn = None
+        self._lock = threading.Lock()
+        if path.endswith('.json'):
+            with open(path, encoding='utf-8') as f:
+                self._results = {
+                    normalize_query(query): [SearchResult(item.get('title', ''), item.get('snippet', '')) for item in items]
+                    for query, items in json.load(f).items()
+                }
+        else:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+
+    def search(self, query, num_results=5):
+        if self._results is not None:
+            return self._results.get(normalize_query(query), [])[:num_results]
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT title, snippet FROM search_results WHERE lower(trim(query)) = ? ORDER BY rank LIMIT ?",
+                (normalize_query(query), num_results)
+            ).fetchall()
+        return [SearchResult(title, snippet) for title, snippet in rows]
+
+
+class NoSearchBackend(SearchBackend):
+    name = 'none'
+
+    def search(self, query, num_results=5):
+        return []
+
+
+class CachedSearchBackend(SearchBackend):
+    # Keeps results of the wrapped backend in a SQLite cache, so a company
+    # that needed the search fallback in an earlier run costs nothing the
+    # next time. Empty results are not cached, they are usually a failed search.
+
+    def __init__(self, backend, path=SEARCH_CACHE_PATH, ttl=SEARCH_CACHE_TTL):
+        self.backend = backend
+        self.name = backend.name
+        self._store = SQLiteCache(path, table='search_results', ttl=ttl)
+
+    def _key(self, query, num_results):
+        return f"{self.backend.name}:{num_results}:{normalize_query(query)}"
+
+    def search(self, query, num_results=5):
+        key = self._key(query, num_results)
+        entry = self._store.get(key)
+        if entry is not None:
+            search_metrics.incr('cache_hits')
+            return [SearchResult(*result) for result in json.loads(entry.value)]
+
+        search_metrics.incr('cache_misses')
+        results = self.backend.search(query, num_results)
+        if results:
+            self._store.set(key, json.dumps(results).encode('utf-8'), {'query': query})
+        return results
+
+
+BACKENDS = {
+    'duckduckgo': DuckDuckGoBackend,
+    'local': LocalSearchBackend,
+    'none': NoSearchBackend,
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def create_search_backend(name=SEARCH_BACKEND, cache=SEARCH_CACHE_ENABLED, session=None):
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown search backend '{name}'. Choose one of: {', '.join(BACKENDS)}")
+    # Only searches that go out to the network are worth caching
+    cache = cache and name == 'duckduckgo'
+    backend = DuckDuckGoBackend(session=session) if name == 'duckduckgo' else BACKENDS[name]()
+    if cache:
+        backend = CachedSearchBackend(backend)
+    logger.info(f"Using search backend: {name} (cached: {cache})")
+    return backend
+
+
+def get_search_backend(session=None):
+    # session is only used when the backend is first created
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = create_search_backend(session=session)
+    return _backend
+
+
+def set_search_backend(backend):
+    # For tests and benchmarks, e.g. set_search_backend(LocalSearchBackend('fixtures/search.json'))
+    global _backend
+    with _backend_lock:
+        _backend = backend
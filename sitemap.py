@@ -0,0 +1,135 @@
+import gzip
+import io
+import logging
+import xml.etree.ElementTree as ET
+from urllib.parse import urljoin, urlparse
+from config import SITEMAP_MAX_FILES
+
+logger = logging.getLogger(__name__)
+
+# Content types robots.txt and sitemaps are served with in the wild
+SITEMAP_CONTENT_TYPES = ['text/plain', 'text/xml', 'application/xml', 'application/gzip', 'application/x-gzip', 'application/octet-stream']
+
+# Path fragments that identify the pages we are after, as in select_pages
+PAGE_KEYWORDS = {'about': 'about', 'product': 'product'}
+
+
+def site_host(url):
+    host = urlparse(url).netloc.lower()
+    return host[4:] if host.startswith('www.') else host
+
+
+def sitemap_hints(robots_text):
+    # Sitemap: lines from robots.txt
+    hints = []
+    for line in robots_text.splitlines():
+        name, _, value = line.partition(':')
+        if name.strip().lower() == 'sitemap' and value.strip():
+            hints.append(value.strip())
+    return hints
+
+
+def iter_sitemap(content):
+    # Streams <loc> entries out of a sitemap or sitemap index, gzipped or not.
+    # Yields ('sitemap', url) for index entries and ('page', url) for pages.
+    # A truncated or broken file yields whatever was readable.
+    stream = io.BytesIO(content)
+    if content[:2] == b'\x1f\x8b':
+        stream = gzip.GzipFile(fileobj=stream)
+    root = None
+    kind = None
+    try:
+        for event, element in ET.iterparse(stream, events=('start', 'end')):
+            tag = element.tag.rsplit('}', 1)[-1]
+            if event == 'start':
+                if root is None:
+                    root = element
+                    kind = 'sitemap' if tag == 'sitemapindex' else 'page'
+                continue
+            if tag == 'loc' and element.text:
+                yield kind, element.text.strip()
+            elif tag in ('url', 'sitemap'):
+                # Drop entries we are done with so memory stays flat on 50k URL sitemaps
+                root.clear()
+    except (ET.ParseError, EOFError, OSError) as e:
+        logger.info(f"Stopped reading sitemap early: {e}")
+
+
+def path_rank(url):
+    # Shallower and shorter paths first: /about-us beats /about-us/team
+    path = urlparse(url).path.strip('/')
+    return (path.count('/'), len(path))
+
+
+class SitemapDiscovery:
+    # Finds the about and product pages of a site from /robots.txt sitemap
+    # hints or /sitemap.xml, without touching the homepage. The I/O is left
+    # to the caller so both scraper engines can drive it:
+    #
+    #     discovery = SitemapDiscovery(base_url)
+    #     while (url := discovery.next_url()) is not None:
+    #         discovery.feed(url, fetch(url))   # bytes, or None on failure
+    #     pages = discovery.pages()
+
+    def __init__(self, base_url, max_files=SITEMAP_MAX_FILES):
+        self.base_url = base_url
+        self.host = site_host(base_url)
+        self.max_files = max_files
+        self.robots_url = urljoin(base_url, '/robots.txt')
+        self._queue = [self.robots_url]
+        self._seen = set()
+        self._files_read = 0
+        self._page_urls = 0
+        self._best = dict.fromkeys(PAGE_KEYWORDS)
+
+    def _complete(self):
+        return all(self._best.values())
+
+    def next_url(self):
+        while self._queue and self._files_read < self.max_files and not self._complete():
+            url = self._queue.pop(0)
+            if url not in self._seen:
+                self._seen.add(url)
+                return url
+        return None
+
+    def feed(self, url, content):
+        if url == self.robots_url:
+            hints = sitemap_hints(content.decode('utf-8', errors='replace')) if content else []
+            self._queue.extend(hints or [urljoin(self.base_url, '/sitemap.xml')])
+            return
+        if not content:
+            return
+
+        self._files_read += 1
+        children = []
+        for kind, loc in iter_sitemap(content):
+            if kind == 'sitemap':
+                children.append(loc)
+            else:
+                self._page_urls += 1
+                self._consider(loc)
+        # WordPress and friends split sitemaps by type; pages are where the about page lives
+        children.sort(key=lambda loc: 'page' not in loc.lower())
+        self._queue.extend(children)
+        logger.info(f"Read sitemap {url}: {len(children)} child sitemaps, {self._page_urls} page URLs so far")
+
+    def _consider(self, url):
+        if site_host(url) != self.host:
+            return
+        path = urlparse(url).path.lower()
+        for page_type, keyword in PAGE_KEYWORDS.items():
+            if keyword in path:
+                best = self._best[page_type]
+                if best is None or path_rank(url) < path_rank(best):
+                    self._best[page_type] = url
+                break
+
+    def pages(self):
+        # None when the site has no usable sitemap, so the caller falls back
+        # to scoring the homepage links
+        if not any(self._best.values()):
+            return None
+        pages = {'home': self.base_url, **self._best}
+        logger.info(f"Pages found from sitemap: {pages}")
+        return pages
@@ -0,0 +1,132 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+CacheEntry = namedtuple('CacheEntry', ['key', 'value', 'metadata', 'created_at'])
+
+
+class SQLiteCache:
+    # Small key/value store on top of SQLite, shared by the on-disk caches.
+    # Values are zlib-compressed blobs with a JSON metadata column. Entries
+    # older than ttl seconds are treated as expired, and once the stored
+    # size passes max_bytes the least recently used entries are evicted.
+
+    def __init__(self, path, table='cache', ttl=None, max_bytes=None, compress=True):
+        self.path = os.path.expanduser(path)
+        self.table = table
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # One connection shared by all threads, serialized by self._lock.
+        # WAL mode lets other processes read while we write.
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(f"""CREATE TABLE IF NOT EXISTS {table} (
+                key TEXT PRIMARY KEY,
+                value BLOB,
+                metadata TEXT,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )""")
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_accessed_at ON {table} (accessed_at)")
+            self._total_bytes = self._conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {table}").fetchone()[0]
+
+    def is_expired(self, entry, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        return ttl is not None and time.time() - entry.created_at > ttl
+
+    def get(self, key, include_expired=False):
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, metadata, created_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            with self._conn:
+                self._conn.execute(f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (time.time(), key))
+
+        value, metadata, created_at = row
+        if value is not None and self.compress:
+            value = zlib.decompress(value)
+        entry = CacheEntry(key, value, json.loads(metadata) if metadata else {}, created_at)
+        if not include_expired and self.is_expired(entry):
+            return None
+        return entry
+
+    def set(self, key, value, metadata=None):
+        if value is not None and self.compress:
+            value = zlib.compress(value)
+        size = len(value or b'') + len(key)
+        now = time.time()
+        with self._lock:
+            with self._conn:
+                previous = self._conn.execute(f"SELECT size FROM {self.table} WHERE key = ?", (key,)).fetchone()
+                self._conn.execute(
+                    f"INSERT OR REPLACE INTO {self.table} (key, value, metadata, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, value, json.dumps(metadata or {}), size, now, now)
+                )
+            self._total_bytes += size - (previous[0] if previous else 0)
+            if self.max_bytes and self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def touch(self, key, metadata=None):
+        # Mark an entry as fresh again, e.g. after a successful revalidation
+        now = time.time()
+        with self._lock, self._conn:
+            if metadata is None:
+                self._conn.execute(f"UPDATE {self.table} SET created_at = ?, accessed_at = ? WHERE key = ?", (now, now, key))
+            else:
+                self._conn.execute(
+                    f"UPDATE {self.table} SET created_at = ?, accessed_at = ?, metadata = ? WHERE key = ?",
+                    (now, now, json.dumps(metadata), key)
+                )
+
+    def delete(self, key):
+        with self._lock:
+            with self._conn:
+                row = self._conn.execute(f"SELECT size FROM {self.table} WHERE key = ?", (key,)).fetchone()
+                self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+            if row:
+                self._total_bytes -= row[0]
+
+    def _evict(self):
+        # Drop least recently used entries until we are back under 90% of the cap
+        target = int(self.max_bytes * 0.9)
+        evicted = 0
+        with self._conn:
+            # Other processes may share the file, so start from the real total
+            self._total_bytes = self._conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {self.table}").fetchone()[0]
+            rows = self._conn.execute(f"SELECT key, size FROM {self.table} ORDER BY accessed_at ASC").fetchall()
+            doomed = []
+            for key, size in rows:
+                if self._total_bytes <= target:
+                    break
+                doomed.append((key,))
+                self._total_bytes -= size
+                evicted += 1
+            self._conn.executemany(f"DELETE FROM {self.table} WHERE key = ?", doomed)
+        logger.info(f"Evicted {evicted} entries from {self.path}:{self.table} ({self._total_bytes} bytes remain)")
+
+    def stats(self):
+        with self._lock:
+            count = self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+            return {'entries': count, 'bytes': self._total_bytes}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,10 +1,11 @@
 import re
-import nltk
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize, sent_tokenize
 from collections import Counter
+from keyword_ranking import batch_top_keywords
+from nltk_resources import ensure_resource, load_nltk, sentence_tokenizer, warm_up
+from vertical_index import KeywordIndex
 import logging 
 import string
+import sys
 
 logger = logging.getLogger(__name__)
 
@@ -28,24 +29,68 @@ def preprocess_content(content):
         logger.error(f"Error in preprocess_content: {str(e)}")
         return str(content)  # Return string representation as fallback
 
-def extract_key_content(text, max_words=50000):
-    # Tokenize the text into sentences
-    sentences = sent_tokenize(text)
+_stop_words = None
 
-    # Tokenize words and remove stopwords and punctuation
-    stop_words = set(stopwords.words('english'))
-    words = [word.lower() for sentence in sentences for word in word_tokenize(sentence) 
-             if word.lower() not in stop_words and word not in string.punctuation]
+def get_stop_words():
+    # Loaded once per process instead of on every call. warm_up loads
+    # NLTK's lazy corpus readers under a lock first, whichever entry point
+    # gets here; several threads loading them at once race inside NLTK.
+    global _stop_words
+    if _stop_words is None:
+        warm_up()
+        ensure_resource('stopwords')
+        _stop_words = frozenset(load_nltk().corpus.stopwords.words('english'))
+    return _stop_words
+
+def split_sentences(text):
+    # The sentence splitter's data is checked for (and fetched if need be)
+    # on first use rather than at import
+    warm_up()
+    ensure_resource(sentence_tokenizer())
+    return load_nltk().tokenize.sent_tokenize(text)
+
+def tokenize_sentence(sentence):
+    # word_tokenize would run the sentence splitter again on text that
+    # sent_tokenize already split into sentences
+    return load_nltk().tokenize.word_tokenize(sentence, preserve_line=True)
+
+def content_words(tokens, stop_words):
+    return [word.lower() for word in tokens if word.lower() not in stop_words and word not in string.punctuation]
+
+def mentions_vocabulary(lowered_sentence, sentence_words, vocabulary, word_lengths):
+    # Whether any vocabulary word occurs in the sentence as a substring.
+    # Nearly always one of the sentence's own words settles it.
+    for word in sentence_words:
+        if word in vocabulary and word in lowered_sentence:
+            return True
+    # Otherwise look up every substring of each vocabulary word length, which
+    # finds words hidden inside longer tokens (numbers, hyphenated words)
+    for length in word_lengths:
+        if length > len(lowered_sentence):
+            break
+        for start in range(len(lowered_sentence) - length + 1):
+            if lowered_sentence[start:start + length] in vocabulary:
+                return True
+    return False
+
+def select_key_content(sentences, sentence_words, max_words=50000):
+    # Keeps the sentences that contain any of the max_words most common
+    # non-stopwords. Linear in the length of the text: each sentence is
+    # checked against the vocabulary set instead of scanning it once per word.
 
     # Get the most common words
-    word_freq = nltk.FreqDist(words)
-    most_common = word_freq.most_common(max_words)
+    word_freq = Counter(word for words in sentence_words for word in words)
+    if len(word_freq) > max_words:
+        vocabulary = {word for word, _ in word_freq.most_common(max_words)}
+    else:
+        vocabulary = set(word_freq)
+    word_lengths = sorted({len(word) for word in vocabulary})
 
     # Reconstruct the text using sentences containing the most common words
-    key_sentences = []
-    for sentence in sentences:
-        if any(word[0] in sentence.lower() for word in most_common):
-            key_sentences.append(sentence)
+    key_sentences = [
+        sentence for sentence, words in zip(sentences, sentence_words)
+        if mentions_vocabulary(sentence.lower(), words, vocabulary, word_lengths)
+    ]
 
     # Join the key sentences
     key_content = ' '.join(key_sentences)
@@ -57,22 +102,113 @@ def extract_key_content(text, max_words=50000):
 
     return key_content
 
+def extract_key_content(text, max_words=50000):
+    # Tokenize the text into sentences
+    sentences = split_sentences(text)
+
+    # Tokenize words and remove stopwords and punctuation
+    stop_words = get_stop_words()
+    sentence_words = [content_words(tokenize_sentence(sentence), stop_words) for sentence in sentences]
+
+    return select_key_content(sentences, sentence_words, max_words)
+
+class AnalyzedDocument:
+    # One page of text, tokenized once for every feature the prompt needs:
+    # the key content summary and the top keywords. Words are interned and
+    # kept in tuples, so the many repeats of a word across a page (and across
+    # the rows of a batch) share one string object.
+    __slots__ = ('sentences', 'sentence_words', 'keyword_counts')
+
+    def __init__(self, text):
+        stop_words = get_stop_words()
+        self.sentences = split_sentences(text)
+        self.sentence_words = []
+        self.keyword_counts = Counter()
+        for sentence in self.sentences:
+            tokens = tokenize_sentence(sentence)
+            lowered = [sys.intern(token.lower()) for token in tokens]
+            self.sentence_words.append(tuple(
+                word for token, word in zip(tokens, lowered) if word not in stop_words and token not in string.punctuation
+            ))
+            self.keyword_counts.update(word for word in lowered if word.isalnum() and word not in stop_words)
+
+    def summary(self, max_words=50000):
+        return select_key_content(self.sentences, self.sentence_words, max_words)
+
+    def top_keywords(self, num_keywords=10):
+        return [word for word, _ in self.keyword_counts.most_common(num_keywords)]
+
+def merged_keyword_counts(documents):
+    counts = Counter()
+    for document in documents:
+        counts.update(document.keyword_counts)
+    return counts
+
+def combined_keywords(documents, num_keywords=10):
+    # Top keywords of several pages together, from their merged counts
+    return [word for word, _ in merged_keyword_counts(documents).most_common(num_keywords)]
+
+def build_key_content(webpage_content, home=None, about=None, keywords=None):
+    # The page features that go into the prompt. keywords, when given, is a
+    # (home, about, combined) tuple of keyword lists ranked across a batch.
+    home = home or AnalyzedDocument(webpage_content.get('home', ''))
+    about = about or AnalyzedDocument(webpage_content.get('about', ''))
+    home_keywords, about_keywords, all_keywords = keywords or (home.top_keywords(), about.top_keywords(), combined_keywords([home, about]))
+    return {
+        'source': 'website',
+        'home': {
+            'summary': home.summary(),
+            'top_keywords': home_keywords
+        },
+        'about': {
+            'summary': about.summary(),
+            'top_keywords': about_keywords
+        },
+        'combined_keywords': all_keywords,
+        'product_exists': 'products' in webpage_content or 'services' in webpage_content
+    }
+
+def build_batch_key_content(webpage_contents, num_keywords=10):
+    # Pipeline stage between scraping and the AI for a whole CSV batch.
+    # Keywords are ranked by TF-IDF across the batch: per page against all
+    # pages, combined keywords against all rows. None for rows without content.
+    # Each row's summaries are built as soon as it is analyzed, and only its
+    # keyword counts are kept for the ranking, not its sentences and tokens.
+    key_contents = [None] * len(webpage_contents)
+    indexes = []
+    page_counts = []
+    row_counts = []
+    for index, content in enumerate(webpage_contents):
+        if not content:
+            continue
+        home, about = AnalyzedDocument(content.get('home', '')), AnalyzedDocument(content.get('about', ''))
+        key_contents[index] = build_key_content(content, home, about, ([], [], []))
+        indexes.append(index)
+        page_counts += [home.keyword_counts, about.keyword_counts]
+        row_counts.append(merged_keyword_counts([home, about]))
+
+    page_keywords = batch_top_keywords(page_counts, num_keywords)
+    row_keywords = batch_top_keywords(row_counts, num_keywords)
+    for position, index in enumerate(indexes):
+        key_contents[index]['home']['top_keywords'] = page_keywords[2 * position]
+        key_contents[index]['about']['top_keywords'] = page_keywords[2 * position + 1]
+        key_contents[index]['combined_keywords'] = row_keywords[position]
+    return key_contents
+
+# Phrases that reveal a business model, matched anywhere in the text like a
+# plain `in` test, all in a single pass over the page
+BUSINESS_MODEL_INDICATORS = {
+    'B2B': ['b2b', 'business to business'],
+    'B2C': ['b2c', 'business to consumer'],
+    'Non-profit': ['non-profit', 'nonprofit', '501(c)3'],
+    'E-commerce': ['e-commerce', 'online store'],
+    'Wholesale': ['wholesale'],
+    'Manufacturing': ['manufacturer', 'manufacturing'],
+}
+
+business_model_index = KeywordIndex([phrase for phrases in BUSINESS_MODEL_INDICATORS.values() for phrase in phrases], whole_words=False)
+
 def extract_business_model_indicators(webpage_content):
-    indicators = []
     content = webpage_content.get('home', '') + ' ' + webpage_content.get('about', '')
-    content = content.lower()
-    
-    if 'b2b' in content or 'business to business' in content:
-        indicators.append('B2B')
-    if 'b2c' in content or 'business to consumer' in content:
-        indicators.append('B2C')
-    if 'non-profit' in content or 'nonprofit' in content or '501(c)3' in content:
-        indicators.append('Non-profit')
-    if 'e-commerce' in content or 'online store' in content:
-        indicators.append('E-commerce')
-    if 'wholesale' in content:
-        indicators.append('Wholesale')
-    if 'manufacturer' in content or 'manufacturing' in content:
-        indicators.append('Manufacturing')
-    
-    return indicators
\ No newline at end of file
+    found = business_model_index.find(content)
+    return [indicator for indicator, phrases in BUSINESS_MODEL_INDICATORS.items() if not found.isdisjoint(phrases)]
@@ -1,6 +1,8 @@
 import re
+import ipaddress
 import validators
 import logging
+from urllib.parse import urlparse
 
 logger = logging.getLogger(__name__)
 
@@ -45,4 +47,84 @@ def is_valid_url(url):
         return result
     except Exception as e:
         logger.error(f"Error in URL validation for {url}: {str(e)}")
-        return False
\ No newline at end of file
+        return False
+
+# Hosting platforms that give every customer a site under their own domain
+# (acme.myshopify.com, foo.wixsite.com/shop). Sites on them belong to
+# different companies, so they are told apart by host and path. Used on top
+# of the private section of the Public Suffix List when tldextract is
+# installed, and on its own when it is not.
+SHARED_HOSTING_SUFFIXES = {
+    'myshopify.com', 'wixsite.com', 'wix.com', 'squarespace.com', 'square.site', 'weebly.com', 'wordpress.com',
+    'blogspot.com', 'godaddysites.com', 'webflow.io', 'carrd.co', 'business.site', 'github.io', 'gitlab.io',
+    'netlify.app', 'vercel.app', 'pages.dev', 'web.app', 'firebaseapp.com', 'herokuapp.com', 'azurewebsites.net',
+    'sites.google.com',
+}
+
+# Social networks and directories where a Web Address is one company's
+# profile (facebook.com/acme, linkedin.com/company/acme), with the number of
+# path segments that name the profile. Any subdomain (m., uk., fr-fr.) is
+# the same site.
+PROFILE_SITES = {
+    'facebook.com': 1, 'fb.com': 1, 'instagram.com': 1, 'twitter.com': 1, 'x.com': 1, 'tiktok.com': 1,
+    'pinterest.com': 1, 'linktr.ee': 1, 'linkedin.com': 2, 'youtube.com': 2, 'yelp.com': 2, 'etsy.com': 2,
+    'tripadvisor.com': 2, 'yellowpages.com': 3, 'bbb.org': 4, 'crunchbase.com': 2, 'google.com': 3,
+}
+
+def profile_site(host):
+    labels = host.split('.')
+    return next((site for site in ('.'.join(labels[i:]) for i in range(len(labels) - 1)) if site in PROFILE_SITES), None)
+
+_tld_extract = None
+
+def _tld_extractor():
+    global _tld_extract
+    if _tld_extract is None:
+        try:
+            import tldextract
+            # The bundled suffix list snapshot, private domains included; never fetch it over the network
+            _tld_extract = tldextract.TLDExtract(suffix_list_urls=(), include_psl_private_domains=True)
+        except ImportError:
+            _tld_extract = False
+    return _tld_extract or None
+
+def is_shared_hosting(host):
+    labels = host.split('.')
+    return any('.'.join(labels[i:]) in SHARED_HOSTING_SUFFIXES for i in range(len(labels) - 1))
+
+def site_key(url):
+    # What identifies one company's website, for grouping rows: the
+    # registrable domain (https://shop.acme.co.uk/en and www.acme.co.uk both
+    # give acme.co.uk), the host and path for sites on shared hosting
+    # (acme.myshopify.com and beta.myshopify.com stay apart), the site and
+    # profile path for social and directory profiles (facebook.com/acme),
+    # and the exact host when tldextract is not installed to find the
+    # registrable domain.
+    # None for empty or unparseable input.
+    if not isinstance(url, str) or not url.strip():
+        return None
+    url = url.strip().lower()
+    parsed = urlparse(url if '://' in url else 'http://' + url)
+    host = parsed.hostname
+    if not host:
+        return None
+    host = host.rstrip('.')
+    try:
+        ipaddress.ip_address(host)
+        return host
+    except ValueError:
+        pass
+    host = re.sub(r'^www\.', '', host)
+
+    extract = _tld_extractor()
+    result = extract(host) if extract is not None else None
+    if is_shared_hosting(host) or getattr(result, 'is_private', False):
+        path = parsed.path.rstrip('/')
+        return host + path
+    site = profile_site(host)
+    if site is not None:
+        segments = [segment for segment in parsed.path.split('/') if segment][:PROFILE_SITES[site]]
+        return '/'.join([site] + segments)
+    if result is not None and result.domain and result.suffix:
+        return f"{result.domain}.{result.suffix}"
+    return host
@@ -1,6 +1,4 @@
 import logging
-import oci
-from oci.config import from_file
 import functools
 from url_utils import normalize_url, extract_url_from_input, is_valid_url
 from config import OCI_CONFIG_PROFILE, OCI_COMPARTMENT_ID
@@ -22,7 +20,10 @@ def error_handler(func):
     return wrapper
 
 def setup_oci_client(config_profile=OCI_CONFIG_PROFILE):
-    config = from_file('~/.oci/config', config_profile)
+    # The OCI SDK takes a quarter of a second to import, so the entry points
+    # only pay for it once a client is actually needed
+    import oci
+    config = oci.config.from_file('~/.oci/config', config_profile)
     endpoint = "https://inference.generativeai.us-chicago-1.oci.oraclecloud.com"
     generative_ai_inference_client = oci.generative_ai_inference.GenerativeAiInferenceClient(config=config, service_endpoint=endpoint, retry_strategy=oci.retry.NoneRetryStrategy(), timeout=(10,240))
 
@@ -0,0 +1,126 @@
+import logging
+import re
+import threading
+import numpy as np
+from constants import VERTICAL_SUMMARIES
+from config import VERTICAL_TIER1_WEIGHT, VERTICAL_TIER2_WEIGHT, VERTICAL_TIER3_WEIGHT, VERTICAL_NEGATIVE_PENALTY
+from link_scorer import trie_pattern
+
+logger = logging.getLogger(__name__)
+
+WORD_BOUNDARY = re.compile(r'\b')
+
+
+class KeywordIndex:
+    # Finds which of a fixed set of phrases occur in a text in one regex pass,
+    # instead of one `in` scan per phrase. Works like LinkScorer: a lookahead
+    # finds the longest phrase starting at each position, and every phrase
+    # that is a prefix of it starts there too. With whole_words the phrases
+    # must start and end on a word boundary ("ngo" does not match "mongodb"),
+    # otherwise this is the same as testing `phrase in text` for each phrase.
+
+    def __init__(self, phrases, whole_words=True):
+        self.phrases = sorted({phrase.lower() for phrase in phrases if phrase})
+        self.positions = {phrase: position for position, phrase in enumerate(self.phrases)}
+        self._prefixes = {
+            phrase: [self.positions[other] for other in self.phrases
+                     if phrase.startswith(other) and (not whole_words or WORD_BOUNDARY.match(phrase, len(other)))]
+            for phrase in self.phrases
+        }
+        boundary = r'\b' if whole_words else ''
+        first_chars = ''.join(sorted({phrase[0] for phrase in self.phrases}))
+        self._pattern = re.compile(f'{boundary}(?=[{re.escape(first_chars)}])(?=({trie_pattern(self.phrases)}){boundary})') if self.phrases else None
+
+    def find_positions(self, text):
+        # Indexes into self.phrases of every phrase found in text
+        found = set()
+        if self._pattern is None or not text:
+            return found
+        for match in set(self._pattern.findall(text.lower())):
+            found.update(self._prefixes[match])
+        return found
+
+    def find(self, text):
+        return {self.phrases[position] for position in self.find_positions(text)}
+
+
+class VerticalIndex:
+    # Scores a page against every vertical in VERTICAL_SUMMARIES at once.
+    # Each distinct keyword found adds its tier weight to its vertical, and
+    # each negative keyword subtracts the penalty. A keyword listed for
+    # several verticals, or twice for one, counts for each listing.
+
+    def __init__(self, summaries=VERTICAL_SUMMARIES, tier1_weight=VERTICAL_TIER1_WEIGHT, tier2_weight=VERTICAL_TIER2_WEIGHT,
+                 tier3_weight=VERTICAL_TIER3_WEIGHT, negative_penalty=VERTICAL_NEGATIVE_PENALTY):
+        self.verticals = list(summaries)
+        tier_weights = {'tier1': tier1_weight, 'tier2': tier2_weight, 'tier3': tier3_weight, 'negative': -negative_penalty}
+        entries = [
+            (keyword.lower(), column, tier)
+            for column, details in enumerate(summaries.values())
+            for tier, keywords in details.get('keywords', {}).items()
+            for keyword in keywords
+        ]
+        self._index = KeywordIndex(keyword for keyword, _, _ in entries)
+
+        # keywords x verticals, so scoring a page is one sum over the rows of
+        # the keywords it contains
+        self.weights = np.zeros((len(self._index.phrases), len(self.verticals)))
+        self._listings = [[] for _ in self._index.phrases]
+        for keyword, column, tier in entries:
+            row = self._index.positions[keyword]
+            self.weights[row, column] += tier_weights.get(tier, 0)
+            self._listings[row].append((self.verticals[column], tier))
+
+    def scan(self, text):
+        # Rows of self.weights for the keywords found in text; score_vector
+        # and matches take either a text or the result of a scan
+        return sorted(self._index.find_positions(text))
+
+    def score_vector(self, text, rows=None):
+        # numpy array of scores in the order of self.verticals
+        rows = self.scan(text) if rows is None else rows
+        return self.weights[rows].sum(axis=0)
+
+    def score(self, text):
+        return dict(zip(self.verticals, self.score_vector(text).tolist()))
+
+    def score_pages(self, texts):
+        # pages x verticals score matrix
+        matrix = np.zeros((len(texts), len(self.verticals)))
+        for row, text in enumerate(texts):
+            rows = self.scan(text)
+            if rows:
+                matrix[row] = self.weights[rows].sum(axis=0)
+        return matrix
+
+    def matches(self, text, rows=None):
+        # {vertical: {tier: [keywords]}} for the keywords found, to explain a score
+        found = {}
+        for row in (self.scan(text) if rows is None else rows):
+            for vertical, tier in self._listings[row]:
+                found.setdefault(vertical, {}).setdefault(tier, []).append(self._index.phrases[row])
+        return found
+
+    def ranked(self, text, rows=None):
+        # (vertical, score) pairs, best first; ties keep the VERTICAL_SUMMARIES order
+        scores = self.score_vector(text, rows)
+        order = np.argsort(-scores, kind='stable')
+        return [(self.verticals[column], float(scores[column])) for column in order]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_vertical_index():
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = VerticalIndex()
+                logger.debug(f"Compiled vertical keyword index: {len(_index.weights)} keywords, {len(_index.verticals)} verticals")
+    return _index
+
+
+def score_verticals(text):
+    return get_vertical_index().score(text)
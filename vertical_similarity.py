@@ -0,0 +1,122 @@
+import logging
+import math
+import re
+import threading
+import zlib
+from collections import Counter
+import numpy as np
+from constants import VERTICAL_SUMMARIES
+from config import VERTICAL_TIER1_WEIGHT, VERTICAL_TIER2_WEIGHT, VERTICAL_TIER3_WEIGHT
+from config import PROMPT_TOP_K_VERTICALS, PROMPT_VERTICAL_MARGIN
+
+logger = logging.getLogger(__name__)
+
+# Words are hashed into this many buckets instead of keeping a vocabulary,
+# so a page can be compared without building one
+HASH_DIMENSIONS = 1 << 16
+
+TOKEN = re.compile(r'[a-z0-9]+')
+
+# Always offered to the AI, it is the answer for companies that fit nowhere else
+FALLBACK_VERTICAL = 'General Business'
+
+
+def hashed_counts(text, weight=1.0, counts=None):
+    # {bucket: weighted count} of the words in text
+    counts = Counter() if counts is None else counts
+    for word, count in Counter(TOKEN.findall(text.lower())).items():
+        counts[zlib.crc32(word.encode('utf-8')) % HASH_DIMENSIONS] += count * weight
+    return counts
+
+
+def vertical_text_counts(details, tier_weights):
+    counts = hashed_counts(details.get('vertical_summary', ''))
+    hashed_counts(details.get('qualifying_criteria', ''), counts=counts)
+    # The keyword tiers are what sets the verticals apart, weighted like in VerticalIndex
+    for tier, weight in tier_weights.items():
+        for keyword in details.get('keywords', {}).get(tier, []):
+            hashed_counts(keyword, weight, counts)
+    return counts
+
+
+class VerticalSimilarity:
+    # Ranks the verticals by cosine similarity between a page and each
+    # vertical's summary, criteria and keywords, as hashed bag-of-words
+    # vectors. Counts are log-scaled and weighted by idf across the
+    # verticals, so words every summary uses ("business", "products") count
+    # for nothing.
+
+    def __init__(self, summaries=VERTICAL_SUMMARIES, tier1_weight=VERTICAL_TIER1_WEIGHT, tier2_weight=VERTICAL_TIER2_WEIGHT,
+                 tier3_weight=VERTICAL_TIER3_WEIGHT):
+        self.verticals = list(summaries)
+        tier_weights = {'tier1': tier1_weight, 'tier2': tier2_weight, 'tier3': tier3_weight}
+        documents = [vertical_text_counts(details, tier_weights) for details in summaries.values()]
+
+        document_frequency = np.zeros(HASH_DIMENSIONS)
+        for counts in documents:
+            document_frequency[list(counts)] += 1
+        self.idf = np.log((1 + len(documents)) / (1 + document_frequency))
+
+        self.vectors = np.zeros((len(documents), HASH_DIMENSIONS), dtype=np.float32)
+        for row, counts in enumerate(documents):
+            buckets = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+            values = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+            self.vectors[row, buckets] = (1 + np.log(values)) * self.idf[buckets]
+        norms = np.linalg.norm(self.vectors, axis=1, keepdims=True)
+        self.vectors /= np.where(norms > 0, norms, 1)
+
+    def similarities(self, text):
+        # Cosine similarity to every vertical, in the order of self.verticals
+        counts = hashed_counts(text)
+        if not counts:
+            return np.zeros(len(self.verticals))
+        buckets = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        values = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+        weights = (1 + np.log(values)) * self.idf[buckets]
+        norm = math.sqrt(weights @ weights)
+        if not norm:
+            return np.zeros(len(self.verticals))
+        return self.vectors[:, buckets] @ (weights / norm)
+
+    def candidates(self, text, k=PROMPT_TOP_K_VERTICALS, margin=PROMPT_VERTICAL_MARGIN):
+        # The k most similar verticals, plus any others scoring within margin
+        # (a fraction) of the k-th, plus the fallback vertical. Returned in
+        # VERTICAL_SUMMARIES order, so the same candidates always give the
+        # same prompt. All verticals when k is 0 or the text has nothing to
+        # compare.
+        scores = self.similarities(text)
+        if k <= 0 or k >= len(self.verticals) or not scores.any():
+            return list(self.verticals)
+        order = np.argsort(-scores, kind='stable')
+        chosen = set(order[:k].tolist())
+        cutoff = scores[order[k - 1]] * (1 - margin)
+        return [
+            vertical for column, (vertical, score) in enumerate(zip(self.verticals, scores))
+            if column in chosen or (score > 0 and score >= cutoff) or vertical == FALLBACK_VERTICAL
+        ]
+
+
+_similarity = None
+_similarity_lock = threading.Lock()
+
+
+def get_vertical_similarity():
+    global _similarity
+    if _similarity is None:
+        with _similarity_lock:
+            if _similarity is None:
+                _similarity = VerticalSimilarity()
+    return _similarity
+
+
+def candidate_verticals(webpage_content, k=PROMPT_TOP_K_VERTICALS, margin=PROMPT_VERTICAL_MARGIN):
+    # Candidate-selection stage before construct_prompt: the verticals whose
+    # summaries go into the prompt for this website
+    # Pages that were never fetched hold the 'N/A' placeholder, which is not page text
+    pages = [webpage_content.get(page, '') for page in ('home', 'about')]
+    text = ' '.join(page for page in pages if page and page.strip() != 'N/A')
+    if k <= 0 or not text.strip():
+        return list(VERTICAL_SUMMARIES)
+    candidates = get_vertical_similarity().candidates(text, k, margin)
+    logger.info(f"Candidate verticals for the prompt: {', '.join(candidates)}")
+    return candidates
@@ -1,257 +1,589 @@
 import requests
 import logging
 import random
-from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlparse
 import gzip
 import zlib
 import brotli
-import chardet
 from url_utils import is_valid_url
 from utils import error_handler
+from metrics import Counters
+from html_parser import parse_html, clean_text
+from politeness import get_rate_limiter
+from link_scorer import get_link_scorer
+from charset_detection import decode_html
+from sitemap import SitemapDiscovery, SITEMAP_CONTENT_TYPES
+from search_backends import get_search_backend, format_results
+from dns_cache import DeadDomain, install_resolver_cache, check_domain, dead_domain_reason, connect_failure_reason, record_connect_failure
+from http_cache import FetchedPage, OfflineCacheMiss, page_headers, lookup_for_fetch, record_revalidated, record_fetched
+from config import SCRAPER_POOL_CONNECTIONS, SCRAPER_POOL_MAXSIZE, SCRAPER_RETRY_TOTAL, SCRAPER_RETRY_BACKOFF, SCRAPER_RETRY_AFTER_MAX
+from config import SCRAPER_MAX_BYTES, SCRAPER_ALLOWED_CONTENT_TYPES, SCRAPER_DISCOVERY, SEARCH_MAX_CONCURRENCY
+from config import LINK_ABOUT_KEYWORDS, LINK_PRODUCT_KEYWORDS, LINK_AVOID_KEYWORDS, LINK_TEXT_WEIGHT, LINK_HREF_WEIGHT, LINK_SHORT_URL_BONUS, LINK_AVOID_PENALTY
 from requests.packages.urllib3.util.retry import Retry
+from requests.packages.urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
 from requests.adapters import HTTPAdapter
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+import threading
+import time
 import re
 import io
 
 logger = logging.getLogger(__name__)
 
+# Maximum number of characters of page text handed on to the AI
+MAX_CONTENT_CHARS = 100000
+
+USER_AGENTS = [
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.0 Safari/605.1.15',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:89.0) Gecko/20100101 Firefox/89.0'
+]
+
+# Statuses worth retrying after a backoff, for both the pooled session and the async engine
+RETRY_STATUSES = (500, 502, 504)
+
+# Statuses that mean the host is throttling us; these go through the host rate limiter
+THROTTLE_STATUSES = (429, 503)
+
+# Size of the chunks read from a streamed response body
+STREAM_CHUNK_SIZE = 64 * 1024
+
+scraper_metrics = Counters('scraper')
+
+
+class ContentRejected(Exception):
+    def __init__(self, url, reason):
+        super().__init__(f"Skipped {url}: {reason}")
+        self.url = url
+        self.reason = reason
+
+
+def browser_headers():
+    return {
+        'User-Agent': random.choice(USER_AGENTS),
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+        'Accept-Language': 'en-US,en;q=0.5',
+        'Accept-Encoding': 'gzip, deflate, br',
+        'Referer': 'https://www.google.com/'
+    }
+
+
+def retry_after_seconds(headers):
+    # Retry-After is either a number of seconds or an HTTP date
+    value = headers.get('Retry-After') if headers else None
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds()
+        except (TypeError, ValueError):
+            return None
+    return min(max(seconds, 0), SCRAPER_RETRY_AFTER_MAX)
+
+
+def retry_delay(attempt, headers=None):
+    retry_after = retry_after_seconds(headers)
+    if retry_after is not None:
+        return retry_after
+    return SCRAPER_RETRY_BACKOFF * (2 ** attempt)
+
+
+class CappedRetry(Retry):
+    # Honor Retry-After, but never park a worker for longer than SCRAPER_RETRY_AFTER_MAX
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        if retry_after is None:
+            return None
+        return min(retry_after, SCRAPER_RETRY_AFTER_MAX)
+
+
+class CountingHTTPConnectionPool(HTTPConnectionPool):
+    def _new_conn(self):
+        scraper_metrics.incr('connections_opened')
+        return super()._new_conn()
+
+
+class CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    def _new_conn(self):
+        scraper_metrics.incr('connections_opened')
+        return super()._new_conn()
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    # HTTPAdapter that counts requests and newly opened connections, so that
+    # connection reuse can be read off get_scraper_stats()
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': CountingHTTPConnectionPool,
+            'https': CountingHTTPSConnectionPool,
+        }
+
+    def send(self, request, **kwargs):
+        scraper_metrics.incr('requests_sent')
+        return super().send(request, **kwargs)
+
+
+_session = None
+_session_lock = threading.Lock()
+_search_session = None
+
+
+def create_session(pool_connections=SCRAPER_POOL_CONNECTIONS, pool_maxsize=SCRAPER_POOL_MAXSIZE, retries=SCRAPER_RETRY_TOTAL):
+    install_resolver_cache()
+    retry = CappedRetry(
+        total=retries,
+        backoff_factor=SCRAPER_RETRY_BACKOFF,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset(['GET', 'HEAD']),
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    # pool_connections is the number of hosts kept in the pool,
+    # pool_maxsize the number of keep-alive connections per host
+    adapter = PooledHTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=retry)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def get_session():
+    # One session per process; urllib3 connection pools are thread-safe, so
+    # every worker thread shares the same keep-alive connections
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = create_session()
+    return _session
+
+
+def get_search_session():
+    # Search requests must finish within SEARCH_TIMEOUT, which retries on
+    # read timeouts would multiply, so they get a pool of their own without any
+    global _search_session
+    if _search_session is None:
+        with _session_lock:
+            if _search_session is None:
+                _search_session = create_session(pool_connections=1, pool_maxsize=SEARCH_MAX_CONCURRENCY, retries=0)
+    return _search_session
+
+
+def wait_for_slot(limiter, key):
+    delay = limiter.reserve(key)
+    if delay:
+        scraper_metrics.incr('rate_limit_wait_seconds', delay)
+        time.sleep(delay)
+
+
+def note_response(limiter, key, status_code, headers):
+    # Feed a response back into the host's rate limiter. Returns True when
+    # the host is throttling us and the request should be retried.
+    if status_code in THROTTLE_STATUSES:
+        scraper_metrics.incr('throttled_responses')
+        limiter.penalize(key, retry_after_seconds(headers))
+        return True
+    if status_code < 400:
+        limiter.reward(key)
+    return False
+
+
+def dead_domain_error(error):
+    # Why a failed request means the domain is unreachable, or None
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return 'connect timeout'
+    return connect_failure_reason(error)
+
+
+def content_length(headers):
+    try:
+        return int(headers.get('content-length'))
+    except (TypeError, ValueError):
+        return None
+
+
+def check_response_headers(url, headers, allowed_types=None):
+    # Reject non-HTML responses before any of the body is read
+    content_type = headers.get('content-type', '').split(';')[0].strip().lower()
+    if content_type and content_type not in (allowed_types or SCRAPER_ALLOWED_CONTENT_TYPES):
+        scraper_metrics.incr('responses_rejected')
+        scraper_metrics.incr('bytes_skipped', content_length(headers) or 0)
+        raise ContentRejected(url, f"unsupported content type {content_type}")
+
+
+def body_budget_reached(url, body, headers, max_bytes=SCRAPER_MAX_BYTES):
+    # Called after each chunk; trims body to the byte budget and reports
+    # whether to stop reading. Content-Length counts compressed bytes, so the
+    # skipped figure is an estimate for compressed responses.
+    if len(body) < max_bytes:
+        return False
+    del body[max_bytes:]
+    length = content_length(headers)
+    scraper_metrics.incr('responses_truncated')
+    if length:
+        scraper_metrics.incr('bytes_skipped', max(length - max_bytes, 0))
+    logger.info(f"Stopped reading {url} after {max_bytes} bytes (Content-Length: {length})")
+    return True
+
+
+def read_body(url, response, headers):
+    body = bytearray()
+    for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+        body.extend(chunk)
+        if body_budget_reached(url, body, headers):
+            break
+    scraper_metrics.incr('bytes_downloaded', len(body))
+    return bytes(body)
+
+
+def get_scraper_stats():
+    stats = scraper_metrics.snapshot()
+    stats['connections_reused'] = max(stats.get('requests_sent', 0) - stats.get('connections_opened', 0), 0)
+    return stats
+
+
 def score_link(link_text, link_href):
+    # Scores a single link. select_pages scores all links of a page at once
+    # with link_scorer.LinkScorer, which gives the same scores; this is kept
+    # as the reference implementation for `benchmarks.py links`.
     score = 0
     
     # Keywords in link text
-    about_keywords = ['about', 'about us', 'who we are', 'our story', 'mission', 'vision', 'values', 'team', 'company']
-    product_keywords = ['product', 'products', 'solutions', 'services', 'offerings']
+    about_keywords = LINK_ABOUT_KEYWORDS
+    product_keywords = LINK_PRODUCT_KEYWORDS
     
     for keyword in about_keywords:
         if keyword in link_text.lower():
-            score += 2
+            score += LINK_TEXT_WEIGHT
         if keyword in link_href.lower():
-            score += 1
+            score += LINK_HREF_WEIGHT
     
     for keyword in product_keywords:
         if keyword in link_text.lower():
-            score += 2
+            score += LINK_TEXT_WEIGHT
         if keyword in link_href.lower():
-            score += 1
+            score += LINK_HREF_WEIGHT
     
     # Prefer shorter URLs
     if len(link_href.split('/')) <= 2:
-        score += 1
+        score += LINK_SHORT_URL_BONUS
     
     # Avoid links to external sites or irrelevant sections
-    avoid_keywords = ['contact', 'blog', 'news', 'careers', 'jobs', 'login', 'sign']
+    avoid_keywords = LINK_AVOID_KEYWORDS
     if any(keyword in link_href.lower() for keyword in avoid_keywords):
-        score -= 2
+        score -= LINK_AVOID_PENALTY
     
     return score
 
 
-def find_pages(base_url):
-    try:
-        if not base_url.startswith(('http://', 'https://')):
-            base_url = 'https://' + base_url
+def normalize_base_url(base_url):
+    if not base_url.startswith(('http://', 'https://')):
+        base_url = 'https://' + base_url
+    return base_url
 
-        logger.info(f"Identifying pages from base URL: {base_url}")
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Accept-Encoding': 'gzip, deflate'
-        }
-        response = requests.get(base_url, headers=headers, timeout=10)
-        response.raise_for_status()
-        
-        logger.info(f"Response status code: {response.status_code}")
-
-        if response.status_code == 403:
-            logger.error(f"403 Forbidden error for URL: {base_url}")
-            return {'home': base_url, 'about': None, 'product': None}
-
-        content = response.content
-
-        # Handle various content encodings
-        content_encoding = response.headers.get('Content-Encoding', '').lower()
-        if content_encoding:
-            try:
-                if 'gzip' in content_encoding:
-                    try:
-                        content = gzip.decompress(content)
-                    except IOError:
-                        # If gzip decompression fails, try to read it as plain text
-                        content = io.BytesIO(content).read()
-                        logger.debug("Failed to decompress gzip content, proceeding with raw content.")
-                elif 'deflate' in content_encoding:
-                    content = zlib.decompress(content)
-                elif 'br' in content_encoding:
-                    content = brotli.decompress(content)
-            except Exception as e:
-                logger.debug(f"Failed to decompress content ({content_encoding}): {e}")
-                logger.debug("Proceeding with raw content.")
-
-        # Try to detect the encoding
-        encoding = response.encoding
-        if encoding is None or encoding.lower() == 'iso-8859-1':
-            detected = chardet.detect(content)
-            encoding = detected['encoding']
-
-        # Decode the content with the detected encoding, falling back to UTF-8 if necessary
+
+def decompress_content(content, content_encoding):
+    # Handle various content encodings
+    content_encoding = (content_encoding or '').lower()
+    if content_encoding:
         try:
-            decoded_content = content.decode(encoding or 'utf-8', errors='replace')
-        except (UnicodeDecodeError, LookupError):
-            logger.warning(f"Failed to decode content with detected encoding {encoding}. Falling back to UTF-8.")
-            decoded_content = content.decode('utf-8', errors='replace')
+            if 'gzip' in content_encoding:
+                try:
+                    content = gzip.decompress(content)
+                except IOError:
+                    # If gzip decompression fails, try to read it as plain text
+                    content = io.BytesIO(content).read()
+                    logger.debug("Failed to decompress gzip content, proceeding with raw content.")
+            elif 'deflate' in content_encoding:
+                content = zlib.decompress(content)
+            elif 'br' in content_encoding:
+                content = brotli.decompress(content)
+        except Exception as e:
+            logger.debug(f"Failed to decompress content ({content_encoding}): {e}")
+            logger.debug("Proceeding with raw content.")
+    return content
 
-        soup = BeautifulSoup(decoded_content, 'html.parser')
-        
-        scored_links = []
-        
-        # Add the home page with a high score
-        scored_links.append((base_url, 100, "Home"))
-        
-        logger.info("All links found on the page:")
-        for link in soup.find_all('a', href=True):
-            href = link['href']
-            if href.startswith(('http://', 'https://', '//', 'www')):
-                if urlparse(base_url).netloc not in href:
-                    continue
-            else:
-                href = urljoin(base_url, href)
-            
-            score = score_link(link.text, href)
-            scored_links.append((href, score, link.text))
-            logger.info(f"Link: {href}, Text: {link.text}, Score: {score}")
-        
-        scored_links.sort(key=lambda x: x[1], reverse=True)
-        
-        logger.info("Top scored links:")
-        for href, score, text in scored_links[:10]:
-            logger.info(f"URL: {href}, Text: {text}, Score: {score}")
-        
-        pages = {
-            'home': base_url,
-            'about': None,
-            'product': None
-        }
-        
-        for href, score, text in scored_links:
-            if not pages['about'] and ('about' in href.lower() or 'about' in text.lower()):
-                pages['about'] = href
-            elif not pages['product'] and ('product' in href.lower() or 'product' in text.lower()):
-                pages['product'] = href
-            
-            if pages['about'] and pages['product']:
-                break
-        
-        logger.info(f"Final identified pages: {pages}")
-        return pages
-    
-    except Exception as e:
-        logger.error(f"Error finding pages: {e}")
-        return {'home': base_url, 'about': None, 'product': None}
 
+def header_encoding(headers):
+    # Charset from the Content-Type header, or None when the server did not send one
+    match = re.search(r'charset=["\']?([\w.:-]+)', headers.get('content-type', ''), re.IGNORECASE)
+    return match.group(1) if match else None
 
-def fetch_webpage_content(url):
-    user_agents = [
-        'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-        'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.0 Safari/605.1.15',
-        'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:89.0) Gecko/20100101 Firefox/89.0'
-    ]
+
+def decode_content(content, encoding):
+    # encoding is the charset from the Content-Type header, if any. BOM,
+    # header, <meta charset> and strict UTF-8 are tried before statistical
+    # detection, which only looks at the start of the page.
+    return decode_html(content, encoding)
+
+
+def default_pages(base_url):
+    return {'home': base_url, 'about': None, 'product': None}
+
+
+def select_pages(parsed_page, base_url):
+    scored_links = []
     
-    headers = {
-        'User-Agent': random.choice(user_agents),
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-        'Accept-Language': 'en-US,en;q=0.5',
-        'Accept-Encoding': 'gzip, deflate, br',
-        'Referer': 'https://www.google.com/'
+    # Add the home page with a high score
+    scored_links.append((base_url, 100, "Home"))
+    
+    links = []
+    for href, link_text in parsed_page.links():
+        if href.startswith(('http://', 'https://', '//', 'www')):
+            if urlparse(base_url).netloc not in href:
+                continue
+        else:
+            href = urljoin(base_url, href)
+        links.append((href, link_text))
+
+    logger.debug("All links found on the page:")
+    for (href, link_text), score in zip(links, get_link_scorer().score_links(links)):
+        scored_links.append((href, score, link_text))
+        logger.debug(f"Link: {href}, Text: {link_text}, Score: {score}")
+    
+    scored_links.sort(key=lambda x: x[1], reverse=True)
+    
+    logger.info("Top scored links:")
+    for href, score, text in scored_links[:10]:
+        logger.info(f"URL: {href}, Text: {text}, Score: {score}")
+    
+    pages = {
+        'home': base_url,
+        'about': None,
+        'product': None
     }
     
-    try:
-        response = requests.get(url, headers=headers, timeout=15)
+    for href, score, text in scored_links:
+        if not pages['about'] and ('about' in href.lower() or 'about' in text.lower()):
+            pages['about'] = href
+        elif not pages['product'] and ('product' in href.lower() or 'product' in text.lower()):
+            pages['product'] = href
+        
+        if pages['about'] and pages['product']:
+            break
+    
+    logger.info(f"Final identified pages: {pages}")
+    return pages
+
+
+def extract_text_content(parsed_page, url):
+    # Extract text from the entire page, without script and style elements
+    text_content = clean_text(parsed_page.text())
+
+    logger.info(f"Content extracted from {url}. Length: {len(text_content)}")
+    
+    # Log the actual content (limited to first 100000 characters to avoid extremely large logs)
+    logger.info(f"Extracted content from {url} (first 100000 chars): {text_content[:MAX_CONTENT_CHARS]}")
+
+    return text_content[:MAX_CONTENT_CHARS] + ("..." if len(text_content) > MAX_CONTENT_CHARS else "")
+
+
+def forbidden_message(url):
+    return f"Sorry, access to this website ({url}) is forbidden. The site may have anti-scraping measures in place."
+
+
+def fetch_error_message(url, error):
+    return f"Sorry, I couldn't fetch the content from the webpage {url}. Error: {str(error)}"
+
+
+def skipped_message(url, reason):
+    return f"Sorry, the webpage {url} was skipped: {reason}"
+
+
+def unexpected_error_message(url, error):
+    return f"An unexpected error occurred while processing the webpage {url}. Error: {str(error)}"
+
+
+def is_page_content(page_content):
+    return bool(page_content) and not page_content.startswith("Sorry,") and not page_content.startswith("An unexpected error")
+
+
+def new_website_content():
+    return {'home': 'N/A', 'about': 'N/A', 'product_exists': False, 'source': 'N/A'}
+
+
+def add_page_content(content, page_type, page_content):
+    logger.info(f"Content received for {page_type}: {bool(page_content)}")
+    if is_page_content(page_content):
+        content[page_type] = page_content
+        logger.info(f"{page_type.capitalize()} content length: {len(content[page_type])}")
+        logger.debug(f"{page_type.capitalize()} content (first 1000 chars): {content[page_type][:1000]}")
+        return True
+    logger.warning(f"Failed to fetch content for {page_type} page: {page_content}")
+    return False
+
+
+def apply_search_fallback(content, url, search_content):
+    logger.warning(f"No content found for URL: {url}")
+    if search_content:
+        content['home'] = search_content
+        content['source'] = 'web_search'
+        logger.info(f"DuckDuckGo search fallback successful. Content length: {len(search_content)}")
+    else:
+        logger.warning("DuckDuckGo search fallback failed.")
+    return content
+
+
+def page_html(page):
+    content = decompress_content(page.content, page.headers.get('content-encoding', ''))
+    return decode_content(content, header_encoding(page.headers))
+
+
+def analyze_homepage(page, base_url, pages=None):
+    # Parse the homepage once and use the same DOM for both link discovery
+    # and text extraction. Link scoring is skipped when the pages are already
+    # known from the sitemap.
+    parsed_page = parse_html(page_html(page))
+    if pages is None:
+        pages = select_pages(parsed_page, base_url)
+    return pages, extract_text_content(parsed_page, base_url)
+
+
+def fetch_page(url, timeout=15, allowed_types=None):
+    page, stale_page, cache_headers = lookup_for_fetch(url)
+    if page is not None:
+        return page
+    check_domain(url)
+
+    headers = browser_headers()
+    headers.update(cache_headers)
+
+    limiter = get_rate_limiter()
+    key = limiter.key_for(url)
+    for attempt in range(SCRAPER_RETRY_TOTAL + 1):
+        wait_for_slot(limiter, key)
+        response = get_session().get(url, headers=headers, timeout=timeout, stream=True)
+        if not note_response(limiter, key, response.status_code, response.headers) or attempt == SCRAPER_RETRY_TOTAL:
+            break
+        response.close()
+        logger.info(f"Retrying {url} after status {response.status_code} (attempt {attempt + 1}/{SCRAPER_RETRY_TOTAL})")
+
+    with response:
+        if response.status_code == 304 and stale_page is not None:
+            return record_revalidated(url, stale_page)
         response.raise_for_status()
 
-        if response.status_code == 403:
-            logger.error(f"403 Forbidden error for URL: {url}")
-            return f"Sorry, access to this website ({url}) is forbidden. The site may have anti-scraping measures in place."
+        response_headers = page_headers(response.headers)
+        check_response_headers(url, response_headers, allowed_types)
+        content = read_body(url, response, response_headers)
 
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Remove script and style elements
-        for element in soup(['script', 'style']):
-            element.decompose()
-        
-        # Extract text from the entire page
-        text_content = soup.get_text(separator='\n', strip=True)
-        
-        # Remove extra whitespace
-        text_content = re.sub(r'\s+', ' ', text_content).strip()
+    return record_fetched(url, FetchedPage(response.url, response.status_code, response_headers, content, False))
 
-        logger.info(f"Content extracted from {url}. Length: {len(text_content)}")
-        
-        # Log the actual content (limited to first 100000 characters to avoid extremely large logs)
-        logger.info(f"Extracted content from {url} (first 100000 chars): {text_content[:100000]}")
 
-        return text_content[:100000] + ("..." if len(text_content) > 100000 else "")
-    
+def get_page(url, parse):
+    # Fetch a page and hand it to parse, which returns (pages, text).
+    # Failures come back as (None, error message) like fetch_webpage_content always did.
+    try:
+        return parse(fetch_page(url))
+
+    except OfflineCacheMiss as e:
+        logger.error(str(e))
+        return None, fetch_error_message(url, e)
+
+    except ContentRejected as e:
+        logger.info(str(e))
+        return None, skipped_message(url, e.reason)
+
+    except DeadDomain as e:
+        logger.info(str(e))
+        return None, skipped_message(url, e.reason)
+
+    except requests.exceptions.HTTPError as e:
+        if e.response is not None and e.response.status_code == 403:
+            logger.error(f"403 Forbidden error for URL: {url}")
+            return None, forbidden_message(url)
+        logger.error(f"Failed to fetch content from {url}: {str(e)}")
+        return None, fetch_error_message(url, e)
+
     except requests.exceptions.RequestException as e:
         logger.error(f"Failed to fetch content from {url}: {str(e)}")
-        return f"Sorry, I couldn't fetch the content from the webpage {url}. Error: {str(e)}"
+        record_connect_failure(url, dead_domain_error(e))
+        return None, fetch_error_message(url, e)
     
     except Exception as e:
         logger.error(f"An unexpected error occurred while processing {url}: {e}")
-        return f"An unexpected error occurred while processing the webpage {url}. Error: {str(e)}"
+        return None, unexpected_error_message(url, e)
+
+
+def fetch_sitemap_file(url):
+    # robots.txt or a sitemap, or None when the site does not have one
+    try:
+        page = fetch_page(url, allowed_types=SITEMAP_CONTENT_TYPES)
+        return decompress_content(page.content, page.headers.get('content-encoding', ''))
+    except requests.exceptions.RequestException as e:
+        logger.info(f"Could not fetch {url}: {str(e)}")
+        record_connect_failure(url, dead_domain_error(e))
+    except (ContentRejected, OfflineCacheMiss, DeadDomain) as e:
+        logger.info(f"Could not fetch {url}: {str(e)}")
+    return None
+
+
+def discover_pages(base_url):
+    discovery = SitemapDiscovery(base_url)
+    url = discovery.next_url()
+    while url is not None:
+        discovery.feed(url, fetch_sitemap_file(url))
+        url = discovery.next_url()
+    return discovery.pages()
+
+
+def scrape_homepage(base_url):
+    base_url = normalize_base_url(base_url)
+    logger.info(f"Identifying pages from base URL: {base_url}")
+    sitemap_pages = discover_pages(base_url) if SCRAPER_DISCOVERY == 'sitemap' else None
+
+    def parse(page):
+        logger.info(f"Response status code: {page.status_code} (from cache: {page.from_cache})")
+        return analyze_homepage(page, base_url, sitemap_pages)
+
+    pages, home_content = get_page(base_url, parse)
+    return pages or sitemap_pages or default_pages(base_url), home_content
+
+
+def find_pages(base_url):
+    pages, _ = scrape_homepage(base_url)
+    return pages
+
+
+def fetch_webpage_content(url):
+    _, page_content = get_page(url, lambda page: (None, extract_text_content(parse_html(page_html(page)), url)))
+    return page_content
 
 
 @error_handler
 def get_website_content(url, company_info):
     logger.info(f"Fetching website content for URL: {url}")
-    pages = find_pages(url)
-    content = {'home': 'N/A', 'about': 'N/A', 'product_exists': False, 'source': 'N/A'}
+    content = new_website_content()
 
-    logger.info(f"Pages found: {pages}")
+    reason = dead_domain_reason(url)
+    if reason:
+        logger.info(f"Domain of {url} is known to be unreachable ({reason}), falling back to DuckDuckGo search...")
+        return apply_search_fallback(content, url, duckduckgo_search(company_info))
 
     logger.info("=" * 80)
     logger.info(f"Attempting to scrape pages for URL: {url}")
     logger.info("=" * 80)
 
-    content_found = False
-
-    with requests.Session() as session:
-        retry = Retry(connect=3, backoff_factor=0.5)
-        adapter = HTTPAdapter(max_retries=retry)
-        session.mount('http://', adapter)
-        session.mount('https://', adapter)
-
-        with ThreadPoolExecutor(max_workers=20) as executor:
-            future_to_page = {executor.submit(fetch_webpage_content, pages.get(page_type)): page_type 
-                              for page_type in ['home', 'about'] if pages.get(page_type)}
+    pages, home_content = scrape_homepage(url)
+    logger.info(f"Pages found: {pages}")
+    content_found = add_page_content(content, 'home', home_content)
 
-            for future in as_completed(future_to_page):
-                page_type = future_to_page[future]
-                try:
-                    page_content = future.result()
-                    logger.info(f"Content received for {page_type}: {bool(page_content)}")
-                    if page_content and not page_content.startswith("Sorry,") and not page_content.startswith("An unexpected error"):
-                        content[page_type] = page_content
-                        content_found = True
-                        logger.info(f"{page_type.capitalize()} content length: {len(content[page_type])}")
-                        logger.debug(f"{page_type.capitalize()} content (first 1000 chars): {content[page_type][:1000]}")
-                    else:
-                        logger.warning(f"Failed to fetch content for {page_type} page: {page_content}")
-                except Exception as exc:
-                    logger.error(f"Exception when scraping {page_type} page: {exc}")
+    if pages.get('about'):
+        try:
+            if add_page_content(content, 'about', fetch_webpage_content(pages['about'])):
+                content_found = True
+        except Exception as exc:
+            logger.error(f"Exception when scraping about page: {exc}")
 
     content['product_exists'] = bool(pages.get('product'))
 
     if not content_found:
-        logger.warning(f"No content found for URL: {url}")
         logger.info("Falling back to DuckDuckGo search...")
-        search_content = duckduckgo_search(company_info)
-        if search_content:
-            content['home'] = search_content
-            content['source'] = 'web_search'
-            logger.info(f"DuckDuckGo search fallback successful. Content length: {len(search_content)}")
-        else:
-            logger.warning("DuckDuckGo search fallback failed.")
+        apply_search_fallback(content, url, duckduckgo_search(company_info))
     else:
         content['source'] = 'website'
 
@@ -259,26 +591,8 @@ def get_website_content(url, company_info):
 
 
 def duckduckgo_search(company_info, num_results=5):
+    # Search fallback for rows whose website gave us nothing. Despite the
+    # name, the engine is whatever SEARCH_BACKEND selects, behind a persistent
+    # result cache.
     query = f"{company_info} company information"
-    url = f"https://html.duckduckgo.com/html/?q={requests.utils.quote(query)}"
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
-    
-    try:
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.content, 'html.parser')
-        results = soup.find_all('div', class_='result__body')
-        
-        search_results = []
-        for result in results[:num_results]:
-            title = result.find('a', class_='result__a').text
-            snippet = result.find('a', class_='result__snippet').text
-            search_results.append(f"{title}\n{snippet}\n\n")
-        
-        return ' '.join(search_results)
-    except Exception as e:
-        logger.error(f"Error in DuckDuckGo search: {str(e)}")
-        return ""
\ No newline at end of file
+    return format_results(get_search_backend(session=get_search_session()).search(query, num_results))